@@ -1,16 +1,45 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify
 import requests
+import json
 import time
 import os
 import ipaddress
-import socket
 import re
-from dataclasses import dataclass
-from typing import Dict, Optional
-from urllib.parse import urljoin
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+from step_scheduler import StepScheduler, paced_steps
+from discovery import discovery_targets, iter_discovery
+from probes import PROBE_DEADLINE, cached_probe, check_tcp_port, parse_ports, probe_printer
+from jobs import JobManager, JobQueueFull
+from responses import gzip_body, parse_detail, summarize_response
+from static_assets import build_page_assets
+from inventory import INVENTORY, query_inventory
+from snapshots import SNAPSHOTS, take_snapshot
+from fleet_monitor import create_monitor
+from circuit_breaker import BREAKER
+from async_printer import PRINTER_LOOP, AsyncZebraPrinter, RawResponse
+from printer_locks import PRINTER_LOCKS, PrinterBusy, configuration_key
+from printer_config import PROFILES, CompiledProfile, get_profile, profile_hashes, resolve_profile
+from deadlines import DEADLINE_HEADER, DEFAULT_BUDGET, Deadline, DeadlineExceeded
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Gauge, instrument_configuration
 
 app = Flask(__name__)
 
+# Fleet configuration limits
+FLEET_MAX_WORKERS = int(os.environ.get('FLEET_MAX_WORKERS', 32))
+FLEET_PER_SUBNET_LIMIT = int(os.environ.get('FLEET_PER_SUBNET_LIMIT', 8))
+FLEET_MAX_PRINTERS = int(os.environ.get('FLEET_MAX_PRINTERS', 1024))
+# The proxy's cap on batch workers (read from the same variable), so batch budgets match its real concurrency
+PROXY_BATCH_WORKERS = int(os.environ.get('PROXY_BATCH_WORKERS', 16))
+
+# Background configuration jobs; state is per process, so run gunicorn with one worker and threads
+JOBS = JobManager()
+REGISTRY.register(Gauge('zebra_jobs_queued', 'Background jobs waiting for a worker.',
+                        function=lambda: JOBS.counts()['queued']))
+REGISTRY.register(Gauge('zebra_jobs_running', 'Background jobs currently running.',
+                        function=lambda: JOBS.counts()['running']))
+
 # HTML template for the web interface
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -76,6 +105,13 @@ HTML_TEMPLATE = """
         .step.error {
             background-color: #f2dede;
         }
+        .step.skipped {
+            background-color: #f5f5f5;
+            color: #777;
+        }
+        .step.warning {
+            background-color: #fcf8e3;
+        }
         .advanced-settings {
             margin-top: 20px;
             padding: 15px;
@@ -265,8 +301,8 @@ HTML_TEMPLATE = """
             resultDiv.className = '';
 
             const configUrl = proxyUrl ? 
-                `${proxyUrl}/configure` : 
-                '/configure_printer';
+                `${proxyUrl}/configure/stream` : 
+                '/configure_printer/stream';
             
             const headers = {
                 'Content-Type': 'application/x-www-form-urlencoded'
@@ -280,39 +316,65 @@ HTML_TEMPLATE = """
             formData.append('printer_ip', printerIp);
             formData.append('username', username);
             formData.append('password', password);
+
+            resultDiv.innerHTML = '<h3>Configuring printer...</h3><div id="configSteps"></div>';
+            const stepsDiv = document.getElementById('configSteps');
+            let pendingStep = null;
+
+            // Render each NDJSON progress event as soon as it arrives
+            function renderEvent(event) {
+                if (event.type === 'step_started') {
+                    pendingStep = document.createElement('div');
+                    pendingStep.className = 'step';
+                    pendingStep.textContent = `${event.step}: running...`;
+                    stepsDiv.appendChild(pendingStep);
+                } else if (event.type === 'step') {
+                    const stepDiv = pendingStep || document.createElement('div');
+                    stepDiv.className = `step ${event.status}`;
+                    stepDiv.innerHTML = `${event.step}: ${event.status}
+                        ${event.elapsed !== undefined ? ` (${event.elapsed}s)` : ''}
+                        ${event.error ? '<br>' + event.error : ''}
+                        ${event.reason ? ' - ' + event.reason : ''}`;
+                    if (!pendingStep) {
+                        stepsDiv.appendChild(stepDiv);
+                    }
+                    pendingStep = null;
+                } else if (event.type === 'result') {
+                    const heading = resultDiv.querySelector('h3');
+                    resultDiv.className = event.success ? 'success' : 'error';
+                    heading.textContent = event.success ?
+                        'Printer Configuration Successful!' :
+                        'Configuration Failed';
+                    if (event.elapsed !== undefined) {
+                        heading.textContent += ` (${event.elapsed}s)`;
+                    }
+                }
+            }
             
             fetch(configUrl, {
                 method: 'POST',
                 headers: headers,
                 body: formData.toString()  
             })
-            .then(response => {
+            .then(async response => {
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
-                return response.json();
-            })
-            .then(data => {
-                if (!data.success) {
-                    resultDiv.className = 'error';
-                    resultDiv.innerHTML = '<h3>Configuration Failed</h3>';
-                    
-                    if (data.steps && data.steps.length > 0) {
-                        resultDiv.innerHTML += '<h4>Steps:</h4>';
-                        data.steps.forEach(step => {
-                            resultDiv.innerHTML += `<div class="step ${step.status}">
-                                ${step.step}: ${step.status}
-                                ${step.error ? '<br>' + step.error : ''}
-                            </div>`;
-                        });
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) {
+                        break;
                     }
-                } else {
-                    resultDiv.className = 'success';
-                    resultDiv.innerHTML = '<h3>Printer Configuration Successful!</h3>';
-                    resultDiv.innerHTML += '<h4>Completed Steps:</h4>';
-                    data.steps.forEach(step => {
-                        resultDiv.innerHTML += `<div class="step success">${step.step}: ${step.status}</div>`;
-                    });
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\\n');
+                    buffer = lines.pop();
+                    lines.filter(line => line.trim()).forEach(line => renderEvent(JSON.parse(line)));
+                }
+                if (buffer.trim()) {
+                    renderEvent(JSON.parse(buffer));
                 }
             })
             .catch(error => {
@@ -326,127 +388,395 @@ HTML_TEMPLATE = """
 </html>
 """
 
-@dataclass
-class PrinterConfig:
-    """Configuration settings for the Zebra printer."""
-    media_setup: Dict[str, str] = None
-    general_setup: Dict[str, str] = None
-    settings_setup: Dict[str, str] = None
-    feed_request: Dict[str, str] = None
-    test_print: Dict[str, str] = None
-
-    def __post_init__(self):
-        # Default configuration values
-        self.media_setup = {
-            "0": "1", "1": "1", "2": "1", "3": "0",
-            "4": "832", "5": "3048", "submit": "Submit Changes"
-        }
-        self.general_setup = {
-            "2": "0", "4": "26.0", "6": "4", "5": "0",
-            "7": "2", "8": "0", "submit": "Submit Changes"
-        }
-        self.settings_setup = {"0": "Save Current Configuration"}
-        self.feed_request = {"1": "submit"}
-        self.test_print = {"4": "submit"}
+# The page has no template variables, so it is split into HTML, CSS and JS and compressed once at startup
+UI_ASSETS = build_page_assets(HTML_TEMPLATE)
 
 class ZebraPrinter:
-    """Class to manage Zebra printer operations."""
-    
-    def __init__(self, ip_address: str, username: str = "admin", password: str = "1234", proxy_url: str = None):
-        """Initialize printer with connection details."""
-        self.validate_ip_address(ip_address)
-        self.base_url = f"http://{ip_address}"
-        self.session = requests.Session()
-        self.config = PrinterConfig()
-        self._credentials = {"0": username, "1": password}
-        self.headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    """Class to manage Zebra printer operations.
+
+    A blocking wrapper around AsyncZebraPrinter for the Flask routes and worker threads: each call runs
+    on the shared printer event loop, so a waiting printer holds a socket rather than a thread's I/O.
+    """
+
+    TRANSPORTS = AsyncZebraPrinter.TRANSPORTS
+    validate_ip_address = staticmethod(AsyncZebraPrinter.validate_ip_address)
+
+    def __init__(self, ip_address: str, username: str = "admin", password: str = "1234", proxy_url: str = None,
+                 transport: str = 'web', raw_port: int = 9100, http_port: int = 80, deadline: Deadline = None,
+                 profile: CompiledProfile = None):
+        """Initialize printer with connection details.
+
+        transport selects how settings are applied: 'web' posts the embedded web UI forms,
+        'raw' sends the equivalent ZPL over the raw printing port in a single write.
+        Every request's timeout is cut to what is left of `deadline`, if one is given.
+        `profile` is the compiled configuration profile to apply (the default profile if not given).
+        """
+        self.client = AsyncZebraPrinter(ip_address, username, password, transport=transport, raw_port=raw_port,
+                                        http_port=http_port, deadline=deadline, profile=profile)
         self.proxy_url = proxy_url
-        
-    @staticmethod
-    def validate_ip_address(ip: str):
-        """Validate IP address format."""
-        try:
-            ipaddress.ip_address(ip)
-        except ValueError:
-            raise ValueError("Invalid IP address format")
 
-    def _make_request(self, endpoint: str, data: Dict, method: str = 'POST') -> requests.Response:
-        """Make HTTP request with error handling."""
-        url = urljoin(self.base_url, endpoint)
-        try:
-            if method == 'POST':
-                response = self.session.post(url, data=data, headers=self.headers, timeout=10)
-            else:
-                response = self.session.get(url, params=data, headers=self.headers, timeout=10)
-            
-            response.raise_for_status()
-            return response
-            
-        except requests.RequestException as e:
-            raise Exception(f"Request failed: {str(e)}")
+    @property
+    def ip_address(self) -> str:
+        return self.client.ip_address
+
+    @property
+    def transport(self) -> str:
+        return self.client.transport
+
+    @property
+    def base_url(self) -> str:
+        return self.client.base_url
+
+    @property
+    def config(self) -> CompiledProfile:
+        return self.client.config
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    @property
+    def deadline(self) -> Deadline:
+        return self.client.deadline
+
+    @deadline.setter
+    def deadline(self, deadline: Deadline):
+        self.client.deadline = deadline
+
+    def close(self):
+        """Close the kept-alive connection to the printer."""
+        PRINTER_LOOP.call(self.client.close)
+
+    def __enter__(self) -> 'ZebraPrinter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def apply_configuration(self) -> RawResponse:
+        """Send the whole configuration, including the save, as one ZPL stream over the raw port."""
+        return PRINTER_LOOP.run(self.client.apply_configuration())
 
     def login(self):
         """Authenticate with the printer by trying different credential combinations."""
-        print("Attempting login with different credential combinations...")
-        
-        # Try different combinations
-        combinations = [
-            ({'1': self._credentials['1']}, "password only"),
-            ({'0': self._credentials['0']}, "username only"),
-            (self._credentials, "both username and password")
+        return PRINTER_LOOP.run(self.client.login())
+
+    def is_ready(self) -> bool:
+        """Cheap readiness probe: True once the printer's web server answers a HEAD request."""
+        return PRINTER_LOOP.run(self.client.is_ready())
+
+    def read_current_settings(self) -> Dict[str, Dict[str, str]]:
+        """Read the media and general setup pages and parse them into field-number maps."""
+        return PRINTER_LOOP.run(self.client.read_current_settings())
+
+    def diff_configuration(self, current: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        """Return only the media and general fields that differ from the current settings."""
+        return self.client.diff_configuration(current)
+
+    def plan_changes(self, current: Optional[Dict[str, Dict[str, str]]] = None) -> List:
+        """Build the (operation, description) steps needed to reach the target configuration.
+
+        With the current settings only changed fields are pushed; steps with nothing to push,
+        including the save, get no operation and are reported as skipped.
+        """
+        if current is None:
+            changes = {'media': self.config.media, 'general': self.config.general}
+        else:
+            changes = self.diff_configuration(current)
+        media, general = changes['media'], changes['general']
+        return [
+            ((lambda: self.update_media_setup(media)) if media else None, "Media Setup"),
+            ((lambda: self.update_general_setup(fields=general)) if general else None, "General Setup"),
+            (self.save_settings if media or general else None, "Save Settings")
         ]
-        
-        last_error = None
-        for creds, desc in combinations:
-            try:
-                print(f"Trying {desc}...")
-                response = self._make_request('/settings', creds)
-                if "Incorrect" not in response.text:
-                    print(f"Success with {desc}")
-                    return response
-            except Exception as e:
-                last_error = e
-                print(f"Failed with {desc}: {str(e)}")
-                continue
-        
-        # If all attempts failed
-        raise Exception(f"Login failed with all combinations: {str(last_error)}")
-
-    def update_media_setup(self):
-        """Update media configuration."""
-        data = {
-            "1": "0",  # Media type
-            "16": "0", # Print mode
-            "15": "0"  # Media tracking
-        }
-        return self._make_request('/setmed', data)
 
-    def update_general_setup(self, cutter_mode: bool = False):
-        """Update general configuration."""
-        data = {
-            "1": "0",   # Print method
-            "12": "0"   # Print width
-        }
-        return self._make_request('/setgen', data)
+    def update_media_setup(self, fields: Optional[Dict[str, str]] = None):
+        """Update media configuration (only `fields` if given)."""
+        return PRINTER_LOOP.run(self.client.update_media_setup(fields))
+
+    def update_general_setup(self, cutter_mode: bool = False, fields: Optional[Dict[str, str]] = None):
+        """Update general configuration (only `fields` if given)."""
+        return PRINTER_LOOP.run(self.client.update_general_setup(cutter_mode, fields))
 
     def save_settings(self):
         """Save current configuration."""
-        data = {"1": "1"}  # Save flag
-        return self._make_request('/settings', data)
+        return PRINTER_LOOP.run(self.client.save_settings())
 
     def request_feed(self):
         """Request paper feed."""
-        data = {"1": "1"}  # Feed request
-        return self._make_request('/feed', data)
+        return PRINTER_LOOP.run(self.client.request_feed())
 
     def print_test(self):
         """Perform test print."""
-        data = {"1": "1"}  # Test print flag
-        return self._make_request('/test_print', data)
+        return PRINTER_LOOP.run(self.client.print_test())
+
+def iter_printer_configuration(printer: ZebraPrinter, full: bool = False):
+    """Run the configuration steps, yielding a progress event as each step starts and finishes.
+
+    The last event has type 'result' and carries the same summary run_printer_configuration() returns.
+    Steps describe printer responses compactly unless `full` asks for the whole page.
+    """
+    return instrument_configuration(_configuration_steps(printer, full))
+
+def _configuration_steps(printer: ZebraPrinter, full: bool = False):
+    started = time.monotonic()
+    if printer.transport == 'raw':
+        # The raw port needs no login and takes every setting plus the save in one write
+        steps = [(printer.apply_configuration, "Apply Configuration (raw 9100)")]
+    else:
+        # The remaining steps are planned from the printer's current settings once they are read
+        steps = [
+            (printer.login, "Login"),
+            (printer.read_current_settings, "Read Settings")
+        ]
+
+    scheduler = StepScheduler(printer.is_ready, printer.model, deadline=printer.deadline)
+    results = []
+    changes = None
+    error = None
+    index = 0
+    while index < len(steps):
+        operation, description = steps[index]
+        index += 1
+        if operation is None:
+            results.append({'step': description, 'status': 'skipped', 'reason': 'Already up to date'})
+            yield dict(results[-1], type='step')
+            continue
+
+        yield {'type': 'step_started', 'step': description}
+        step_started = time.monotonic()
+        try:
+            # Abandon the run rather than start a step the deadline leaves no time for
+            printer.deadline.check(description)
+            response = operation()
+            if operation == printer.read_current_settings:
+                changes = printer.diff_configuration(response)
+                steps.extend(printer.plan_changes(response))
+                pending = sum(len(fields) for fields in changes.values())
+                summary = {'message': f"{pending} field(s) differ from the target configuration"}
+            else:
+                summary = summarize_response(response.text, getattr(response, 'status_code', None), full)
+            results.append(dict(
+                {'step': description, 'status': 'success'},
+                **summary,
+                elapsed=round(time.monotonic() - step_started, 3)
+            ))
+        except Exception as step_error:
+            if operation == printer.read_current_settings and not isinstance(step_error, DeadlineExceeded):
+                # Without the current settings, fall back to pushing every field
+                results.append({
+                    'step': description,
+                    'status': 'warning',
+                    'error': f"Could not read current settings, applying all fields: {str(step_error)}",
+                    'elapsed': round(time.monotonic() - step_started, 3)
+                })
+                steps.extend(printer.plan_changes())
+                yield dict(results[-1], type='step')
+                continue
+            results.append({
+                'step': description,
+                'status': 'error',
+                'error': str(step_error),
+                'elapsed': round(time.monotonic() - step_started, 3)
+            })
+            error = f"Failed at {description}: {str(step_error)}"
+        yield dict(results[-1], type='step')
+        if error:
+            break
+
+        # Wait for the printer to settle after a write, unless nothing else will be sent
+        if operation != printer.read_current_settings and any(op for op, _ in steps[index:]):
+            scheduler.wait_ready(printer.model)
+
+    outcome = {'type': 'result', 'success': error is None, 'steps': results}
+    if error:
+        outcome['error'] = error
+    if changes is not None:
+        outcome['changes'] = changes
+    outcome['elapsed'] = round(time.monotonic() - started, 3)
+    if error is None:
+        outcome['profile'] = {'name': printer.config.name, 'version': printer.config.version}
+        outcome['config_hash'] = printer.config.hash
+        INVENTORY.record_configuration(printer.ip_address, outcome['config_hash'], outcome['elapsed'])
+    outcome['wait'] = scheduler.report(steps=paced_steps(results))
+    yield outcome
+
+def run_printer_configuration(printer: ZebraPrinter, full: bool = False) -> Dict:
+    """Run the configuration steps against a printer and collect the step results."""
+    for event in iter_printer_configuration(printer, full):
+        pass
+    event.pop('type')
+    return event
+
+def expand_printer_targets(ip_list, cidr: str = None) -> List[str]:
+    """Build a de-duplicated list of printer IPs from explicit addresses and/or a CIDR range."""
+    if isinstance(ip_list, str):
+        ip_list = re.split(r'[\s,;]+', ip_list)
+
+    targets = []
+    for ip in ip_list or []:
+        ip = str(ip).strip()
+        if ip:
+            ZebraPrinter.validate_ip_address(ip)
+            targets.append(ip)
+
+    if cidr:
+        try:
+            network = ipaddress.ip_network(cidr.strip(), strict=False)
+        except ValueError:
+            raise ValueError("Invalid CIDR range")
+        if network.num_addresses > FLEET_MAX_PRINTERS + 2:
+            raise ValueError(f"CIDR range exceeds the limit of {FLEET_MAX_PRINTERS} printers")
+        targets.extend(str(host) for host in network.hosts())
+
+    targets = list(dict.fromkeys(targets))
+    if len(targets) > FLEET_MAX_PRINTERS:
+        raise ValueError(f"Too many printers requested (limit is {FLEET_MAX_PRINTERS})")
+    return targets
+
+def subnet_key(ip: str) -> str:
+    """Group printers by /24 (IPv4) or /64 (IPv6) subnet for concurrency limiting."""
+    prefix = 24 if ipaddress.ip_address(ip).version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+def configure_fleet(ip_addresses: List[str], username: str = "admin", password: str = "1234",
+                    max_workers: int = FLEET_MAX_WORKERS,
+                    per_subnet_limit: int = FLEET_PER_SUBNET_LIMIT, transport: str = 'web',
+                    http_port: int = 80, full: bool = False, deadline: Deadline = None,
+                    profile: CompiledProfile = None, profiles: Dict[str, CompiledProfile] = None) -> Dict:
+    """Configure many printers in parallel on a bounded worker pool, all within the same optional deadline.
+
+    Every printer gets the same compiled profile, so its payloads are encoded once for the whole fleet,
+    unless `profiles` gives a printer its own.
+    """
+    profile = profile or get_profile()
+
+    def configure_one(ip, queued):
+        printer = None
+        try:
+            printer = ZebraPrinter(ip, username, password, transport=transport, http_port=http_port,
+                                   deadline=deadline, profile=(profiles or {}).get(ip, profile))
+            outcome = PRINTER_LOCKS.run(ip, request_key(printer, username, password, full),
+                                        lambda: run_printer_configuration(printer, full), deadline, 'a fleet run')
+        except Exception as e:
+            outcome = {'success': False, 'error': str(e), 'steps': [], 'elapsed': 0.0}
+        finally:
+            if printer is not None:
+                printer.close()
+        outcome['ip'] = ip
+        outcome['queued'] = round(queued, 3)
+        return outcome
+
+    # Printers wait in per-subnet queues rather than in the pool, so a busy subnet never idles a worker;
+    # subnets take turns, whatever order the targets came in
+    queues = {}
+    for index, ip in enumerate(ip_addresses):
+        queues.setdefault(subnet_key(ip), deque()).append((index, ip))
+    turns = deque(queues)
+    running = dict.fromkeys(queues, 0)
+
+    def next_subnet():
+        for _ in range(len(turns)):
+            key = turns[0]
+            turns.rotate(-1)
+            if queues[key] and running[key] < per_subnet_limit:
+                return key
+        return None
+
+    started = time.monotonic()
+    workers = max(1, min(max_workers, len(ip_addresses)))
+    printers = [None] * len(ip_addresses)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fleet') as executor:
+        while True:
+            while len(in_flight) < workers:
+                key = next_subnet()
+                if key is None:
+                    break
+                index, ip = queues[key].popleft()
+                running[key] += 1
+                in_flight[executor.submit(configure_one, ip, time.monotonic() - started)] = (index, key)
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, key = in_flight.pop(future)
+                running[key] -= 1
+                printers[index] = future.result()
+    wall_time = time.monotonic() - started
+    return summarize_fleet(printers, wall_time, workers, per_subnet_limit)
+
+def summarize_fleet(printers: List[Dict], wall_time: float, workers: int, per_subnet_limit: Optional[int]) -> Dict:
+    """The fleet result: per-printer outcomes keyed by 'ip', with counts and timing."""
+    elapsed = [p['elapsed'] for p in printers]
+    slowest = max(printers, key=lambda p: p['elapsed'], default=None)
+    succeeded = sum(1 for p in printers if p['success'])
+    return {
+        'success': succeeded == len(printers),
+        'total': len(printers),
+        'succeeded': succeeded,
+        'failed': len(printers) - succeeded,
+        'timing': {
+            'wall_time': round(wall_time, 3),
+            'sum_printer_time': round(sum(elapsed), 3),
+            'mean_printer_time': round(sum(elapsed) / len(elapsed), 3) if elapsed else 0.0,
+            'slowest_printer_time': slowest['elapsed'] if slowest else 0.0,
+            'slowest_ip': slowest['ip'] if slowest else None,
+            'workers': workers,
+            'per_subnet_limit': per_subnet_limit
+        },
+        'printers': printers
+    }
+
+def fleet_result_from_batch(batch: Dict) -> Dict:
+    """Reshape a proxy /batch answer into configure_fleet()'s result, so both paths look the same."""
+    printers = []
+    for outcome in batch.get('printers', []):
+        outcome = dict(outcome, ip=outcome.get('printer_ip'))
+        outcome.pop('printer_ip', None)
+        outcome.setdefault('elapsed', 0.0)
+        outcome.setdefault('queued', None)  # the proxy does not report how long a printer waited
+        printers.append(outcome)
+    return summarize_fleet(printers, batch.get('elapsed', 0.0), batch.get('workers', 0), None)
+
+@app.after_request
+def compress_response(response):
+    """Gzip JSON responses for clients that accept it; streamed responses are left as they are."""
+    if (response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    body, compressed = gzip_body(response.get_data(), request.headers.get('Accept-Encoding', ''))
+    if compressed:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def serve_asset(asset):
+    """Serve a prebuilt asset in the best encoding the client accepts, or a 304 if its copy is current."""
+    encoding, body = asset.select(request.headers.get('Accept-Encoding', ''))
+    headers = asset.headers(encoding)
+    if asset.not_modified(request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')):
+        headers.pop('Content-Encoding', None)
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype=asset.mimetype, headers=headers)
 
 @app.route('/')
 def home():
-    return render_template_string(HTML_TEMPLATE)
+    return serve_asset(UI_ASSETS['index.html'])
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    """Serve the UI's fingerprinted CSS and JS."""
+    asset = UI_ASSETS.get(name)
+    if asset is None or name == 'index.html':
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    return serve_asset(asset)
+
+@app.route('/metrics')
+def metrics():
+    """Expose request, step, login and job metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
 
 @app.route('/api/status')
 def api_status():
@@ -466,76 +796,53 @@ def configure_printer():
         username = request.form.get('username', 'admin')
         password = request.form.get('password', '1234')
         proxy_url = request.form.get('proxy_url')
+        transport = request.form.get('transport', 'web')
+        detail = request.values.get('detail', 'compact')
+        full = parse_detail(detail)
+        profile = resolve_profile(request.values.get('profile'))
 
         # Validate IP
         if not ip_address:
             return jsonify({'success': False, 'error': 'IP address is required'})
 
-        # Initialize printer
-        printer = ZebraPrinter(ip_address, username, password, proxy_url)
-
-        # If using proxy, send configuration request to proxy
-        if proxy_url:
-            try:
-                proxy_response = requests.post(
-                    f"{proxy_url}/configure",
-                    data={
-                        'printer_ip': ip_address,
-                        'username': username,
-                        'password': password
-                    },
-                    timeout=30  # Increased timeout for proxy
-                )
-                return jsonify(proxy_response.json())
-            except requests.RequestException as e:
-                return jsonify({
-                    'success': False,
-                    'error': f'Proxy error: {str(e)}',
-                    'steps': [{'step': 'Proxy Connection', 'status': 'error', 'error': str(e)}]
-                })
+        # Initialize printer; the whole run, including any proxy hop, shares the caller's time budget.
+        # Leaving the block closes its kept-alive connection
+        with ZebraPrinter(ip_address, username, password, proxy_url, transport=transport,
+                          deadline=request_deadline(), profile=profile) as printer:
 
-        # Direct configuration without proxy
-        try:
-            # Test connection first
-            printer.login()
-            
-            # Configure printer
-            steps = [
-                (printer.login, "Login"),
-                (printer.update_media_setup, "Media Setup"),
-                (printer.update_general_setup, "General Setup"),
-                (printer.save_settings, "Save Settings")
-            ]
-            
-            results = []
-            for operation, description in steps:
+            # If using proxy, send configuration request to proxy
+            if proxy_url:
                 try:
-                    response = operation()
-                    results.append({
-                        'step': description,
-                        'status': 'success',
-                        'response': response.text if hasattr(response, 'text') else str(response)
-                    })
-                    time.sleep(2)  # Add delay between steps
-                except Exception as step_error:
-                    results.append({
-                        'step': description,
-                        'status': 'error',
-                        'error': str(step_error)
+                    proxy_response = requests.post(
+                        f"{proxy_url}/configure",
+                        data={
+                            'printer_ip': ip_address,
+                            'username': username,
+                            'password': password,
+                            'detail': detail,
+                            'profile': profile.name
+                        },
+                        headers={'X-Printer-IP': ip_address, DEADLINE_HEADER: printer.deadline.header()},
+                        timeout=printer.deadline.timeout(DEFAULT_BUDGET, "proxy request")
+                    )
+                    return jsonify(proxy_response.json())
+                except (requests.RequestException, DeadlineExceeded) as e:
+                    return jsonify({
+                        'success': False,
+                        'error': f'Proxy error: {str(e)}',
+                        'steps': [{'step': 'Proxy Connection', 'status': 'error', 'error': str(e)}]
                     })
-                    raise Exception(f"Failed at {description}: {str(step_error)}")
-            
-            return jsonify({
-                'success': True,
-                'steps': results
-            })
-            
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': str(e),
-                'steps': results if 'results' in locals() else []
-            })
+
+            # Direct configuration without proxy; login is the first configuration step. Identical requests
+            # already running for this printer share that run, different ones queue behind it
+            try:
+                return jsonify(PRINTER_LOCKS.run(ip_address, request_key(printer, username, password, full),
+                                                 lambda: run_printer_configuration(printer, full),
+                                                 printer.deadline, 'a configuration request'))
+            except PrinterBusy as e:
+                return jsonify({'success': False, 'error': str(e), 'steps': []}), 409
+            except DeadlineExceeded as e:
+                return jsonify({'success': False, 'error': str(e), 'steps': []}), 504
 
     except Exception as e:
         return jsonify({
@@ -544,115 +851,416 @@ def configure_printer():
             'steps': []
         })
 
-@app.route('/test_connection', methods=['POST'])
-def test_connection():
-    printer_ip = request.form.get('printer_ip', '').strip()
-    proxy_url = request.form.get('proxy_url', '').strip()
-    
-    try:
-        # Validate IP format
-        ipaddress.ip_address(printer_ip)
-        
-        results = {
-            'ip': printer_ip,
-            'port_9100': False,
-            'http': False,
-            'details': []
-        }
-        
-        # Test port 9100
+def request_deadline(default: Optional[float] = DEFAULT_BUDGET) -> Deadline:
+    """The caller's time budget from the deadline header, or `default` seconds if it sent none."""
+    return Deadline.from_header(request.headers.get(DEADLINE_HEADER), default)
+
+def request_key(printer: ZebraPrinter, username: str, password: str, full: bool) -> str:
+    """What makes two configuration requests for a printer identical, so they can share one run."""
+    return configuration_key(printer.transport, printer.config.hash, username, password, full)
+
+def configuration_events(printer: ZebraPrinter, username: str, password: str, proxy_url: str = None,
+                         full: bool = False, owner: str = 'another configuration'):
+    """Yield configuration progress events, relaying the proxy's stream when a proxy URL is given.
+
+    Direct runs hold the printer's lock while they run; the proxy serializes the printers it configures.
+    """
+    if not proxy_url:
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            result = sock.connect_ex((printer_ip, 9100))
-            sock.close()
-            
-            results['port_9100'] = result == 0
-            results['details'].append(f'Port 9100: {"open" if result == 0 else "closed"}')
-        except Exception as e:
-            results['details'].append(f'Port 9100 test error: {str(e)}')
+            PRINTER_LOCKS.acquire(printer.ip_address, printer.deadline, owner)
+        except (PrinterBusy, DeadlineExceeded) as e:
+            step = {'step': 'Wait for Printer', 'status': 'error', 'error': str(e)}
+            yield dict(step, type='step')
+            yield {'type': 'result', 'success': False, 'error': str(e), 'steps': [step]}
+            return
+        try:
+            yield from iter_printer_configuration(printer, full)
+        finally:
+            PRINTER_LOCKS.release(printer.ip_address)
+        return
+
+    try:
+        with requests.post(
+            f"{proxy_url}/configure/stream",
+            data={'printer_ip': printer.ip_address, 'username': username, 'password': password,
+                  'detail': 'full' if full else 'compact', 'profile': printer.config.name},
+            headers={'X-Printer-IP': printer.ip_address, DEADLINE_HEADER: printer.deadline.header()},
+            stream=True,
+            timeout=printer.deadline.timeout(DEFAULT_BUDGET, "proxy request")
+        ) as proxy_response:
+            proxy_response.raise_for_status()
+            for line in proxy_response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except (requests.RequestException, ValueError, DeadlineExceeded) as e:
+        step = {'step': 'Proxy Connection', 'status': 'error', 'error': str(e)}
+        yield dict(step, type='step')
+        yield {'type': 'result', 'success': False, 'error': f'Proxy error: {str(e)}', 'steps': [step]}
+
+@app.route('/configure_printer/stream', methods=['POST'])
+def configure_printer_stream():
+    """Configure a printer, streaming each step result as an NDJSON line as it completes."""
+    ip_address = request.form.get('printer_ip')
+    username = request.form.get('username', 'admin')
+    password = request.form.get('password', '1234')
+    proxy_url = request.form.get('proxy_url')
+    transport = request.form.get('transport', 'web')
+
+    if not ip_address:
+        return jsonify({'success': False, 'error': 'IP address is required'}), 400
+    try:
+        full = parse_detail(request.values.get('detail'))
+        printer = ZebraPrinter(ip_address, username, password, proxy_url, transport=transport,
+                               deadline=request_deadline(), profile=resolve_profile(request.values.get('profile')))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def generate():
+        for event in configuration_events(printer, username, password, proxy_url, full,
+                                          'a streamed configuration'):
+            yield json.dumps(event) + '\n'
+
+    response = Response(generate(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the stream ends or the client goes away, even if the stream never started
+    response.call_on_close(printer.close)
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a printer configuration in the background and return its job ID immediately."""
+    ip_address = request.form.get('printer_ip')
+    username = request.form.get('username', 'admin')
+    password = request.form.get('password', '1234')
+    proxy_url = request.form.get('proxy_url')
+    transport = request.form.get('transport', 'web')
+
+    if not ip_address:
+        return jsonify({'success': False, 'error': 'IP address is required'}), 400
+    try:
+        full = parse_detail(request.values.get('detail'))
+        printer = ZebraPrinter(ip_address, username, password, proxy_url, transport=transport,
+                               profile=resolve_profile(request.values.get('profile')))
+        budget = request_deadline().budget
+
+        def run():
+            # The budget starts counting when the job starts, not while it waits in the queue
+            printer.deadline = Deadline(budget)
+            with printer:
+                yield from configuration_events(printer, username, password, proxy_url, full, 'a background job')
+
+        job = JOBS.submit(
+            run,
+            f"Configure printer {ip_address}",
+            {'printer_ip': ip_address, 'proxy_url': proxy_url}
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/jobs/{job.id}',
+        'events_url': f'/jobs/{job.id}/events'
+    }), 202
 
-        # Test HTTP connection
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List queued, running and retained finished jobs."""
+    return jsonify({'jobs': [job.to_dict() for job in JOBS.list()]})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return a job's status, its progress events and, once finished, its result."""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(job.to_dict(include_events=True))
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Subscribe to a job's progress events as an NDJSON stream."""
+    if JOBS.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    def generate():
+        for event in JOBS.subscribe(job_id):
+            yield json.dumps(event) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running job after its current step."""
+    job = JOBS.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status,
+                    'cancel_requested': job.cancel_requested.is_set()})
+
+@app.route('/configure_fleet', methods=['POST'])
+def configure_fleet_route():
+    """Configure a list of printers or a CIDR range in parallel."""
+    payload = request.get_json(silent=True) or request.form
+    try:
+        ip_list = payload.get('printer_ips', [])
+        cidr = payload.get('cidr')
+        username = payload.get('username', 'admin')
+        password = payload.get('password', '1234')
+        max_workers = min(int(payload.get('max_workers', FLEET_MAX_WORKERS)), FLEET_MAX_WORKERS)
+        per_subnet_limit = max(1, int(payload.get('per_subnet_limit', FLEET_PER_SUBNET_LIMIT)))
+        transport = payload.get('transport', 'web')
+        if transport not in ZebraPrinter.TRANSPORTS:
+            raise ValueError(f"Invalid transport: {transport}")
+        full = parse_detail(payload.get('detail'))
+        profile = resolve_profile(payload.get('profile'))
+
+        targets = expand_printer_targets(ip_list, cidr)
+        if not targets:
+            return jsonify({'success': False, 'error': 'At least one printer IP or a CIDR range is required'}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # Optionally skip printers the inventory already records as being on the requested profile
+    skipped = 0
+    if str(payload.get('only_outdated', '')).lower() in ('1', 'true', 'yes'):
+        requested = len(targets)
+        targets = INVENTORY.needs_configuration(targets, profile.hash)
+        skipped = requested - len(targets)
+        if not targets:
+            return jsonify({'success': True, 'total': 0, 'succeeded': 0, 'failed': 0, 'skipped': skipped,
+                            'printers': []})
+
+    # Without a deadline header the fleet has no overall budget; each request keeps its own timeout
+    deadline = request_deadline(default=None)
+
+    # Printers behind a local proxy are configured by the proxy in one batch request
+    proxy_url = payload.get('proxy_url')
+    if proxy_url:
+        # The proxy's batches go over the web interface and have no per-subnet limit
+        if transport != 'web':
+            return jsonify({'success': False, 'error': 'Only the web transport is available through a proxy'}), 400
+        if payload.get('per_subnet_limit') not in (None, ''):
+            return jsonify({'success': False, 'error': 'per_subnet_limit is not supported through a proxy'}), 400
+        if deadline.budget is None:
+            # One budget for both sides: the proxy stops when this server stops waiting for it
+            proxy_workers = max(1, min(max_workers, PROXY_BATCH_WORKERS, len(targets)))
+            deadline = Deadline(max(30, 30 * len(targets) / proxy_workers))
+        batch_timeout = deadline.remaining()
         try:
-            response = requests.get(f'http://{printer_ip}', timeout=5)
-            results['http'] = response.status_code == 200
-            results['details'].append(f'HTTP connection: Status {response.status_code}')
-        except requests.Timeout:
-            print("HTTP connection timed out")
-            results['details'].append('HTTP connection timed out')
-        except requests.ConnectionError as e:
-            print(f"HTTP connection error: {e}")
-            results['details'].append(f'HTTP connection refused: {str(e)}')
-        except requests.RequestException as e:
-            print(f"HTTP request error: {e}")
-            results['details'].append(f'HTTP connection failed: {str(e)}')
-
-        return jsonify(results)
-            
-    except ValueError:
-        return jsonify({'error': 'Invalid IP address format'}), 400
-    except Exception as e:
-        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+            proxy_response = requests.post(
+                f"{proxy_url}/batch",
+                json={
+                    'printer_ips': targets,
+                    'username': username,
+                    'password': password,
+                    'detail': 'full' if full else 'compact',
+                    'profile': payload.get('profile'),
+                    'max_workers': max_workers
+                },
+                headers={DEADLINE_HEADER: deadline.header()},
+                timeout=deadline.timeout(batch_timeout, "proxy batch")
+            )
+            result = proxy_response.json()
+            if proxy_response.ok:
+                result = fleet_result_from_batch(result)
+            # Keep this server's inventory current for printers the proxy configured
+            for outcome in result.get('printers', []):
+                if outcome.get('success') and outcome.get('config_hash'):
+                    INVENTORY.record_configuration(outcome['ip'], outcome['config_hash'], outcome['elapsed'])
+            result['skipped'] = skipped
+            return jsonify(result), proxy_response.status_code
+        except (requests.RequestException, ValueError, DeadlineExceeded) as e:
+            return jsonify({'success': False, 'error': f'Proxy error: {str(e)}', 'printers': []}), 502
 
-def test_printer_port(ip, port, timeout=10):
-    """Test a specific printer port using Test-NetConnection"""
+    result = configure_fleet(targets, username, password, max_workers, per_subnet_limit, transport, full=full,
+                             deadline=deadline, profile=profile)
+    result['skipped'] = skipped
+    return jsonify(result)
+
+@app.route('/inventory')
+def inventory():
+    """List known printers, optionally only those not_on_profile=<hash|name|current> or unreachable_for=<seconds>."""
     try:
-        # Use Test-NetConnection which we know works
-        cmd = f'powershell -Command "Test-NetConnection -ComputerName {ip} -Port {port} | Select-Object -ExpandProperty TcpTestSucceeded"'
-        result = os.popen(cmd).read().strip().lower()
-        
-        success = result == "true"
-        print(f"Test-NetConnection to {ip}:{port} {'succeeded' if success else 'failed'}")
-        return success, f"Port {port} is {'open' if success else 'closed'}"
-        
-    except Exception as e:
-        print(f"Error testing connection to {ip}:{port}: {e}")
-        return False, f"Port {port} test error: {str(e)}"
-
-def test_printer_connection(printer_ip):
-    """Test printer connectivity"""
-    results = {
-        'ip': printer_ip,
-        'ping': False,
-        'port_9100': False,
-        'http': False,
-        'details': []
-    }
-    
-    # Test ping
+        return jsonify(query_inventory(request.args, get_profile().hash, profile_hashes()))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/profiles')
+def list_profiles():
+    """List the loaded configuration profiles with their versions and content hashes."""
+    return jsonify({'default': get_profile().name,
+                    'profiles': [profile.to_dict() for profile in PROFILES.values()]})
+
+@app.route('/snapshots', methods=['POST'])
+def create_snapshot():
+    """Read the current settings of a list of printers or a CIDR range concurrently and archive them."""
+    payload = request.get_json(silent=True) or request.form
     try:
-        print(f"\nPinging {printer_ip}...")
-        ping_output = os.popen(f'ping -n 2 -w 1000 {printer_ip}').read()
-        results['ping'] = "bytes=" in ping_output
-        results['details'].append(f'Ping test: {"Successful" if results["ping"] else "Failed"}')
-        results['details'].append(f'Ping details:\n{ping_output}')
-    except Exception as e:
-        print(f"Error during ping: {e}")
-        results['details'].append(f'Ping error: {str(e)}')
+        targets = expand_printer_targets(payload.get('printer_ips', []), payload.get('cidr'))
+        if not targets:
+            return jsonify({'success': False, 'error': 'At least one printer IP or a CIDR range is required'}), 400
+        http_port = int(payload.get('http_port', 80))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        snapshot = take_snapshot(targets, payload.get('username', 'admin'), payload.get('password', '1234'),
+                                 http_port, request_deadline(default=None), payload.get('note', ''))
+    except OSError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify(dict(snapshot, success=not snapshot['errors']))
+
+@app.route('/snapshots', methods=['GET'])
+def list_snapshots():
+    """List archived snapshots, newest first."""
+    return jsonify({'snapshots': SNAPSHOTS.list()})
+
+@app.route('/snapshots/<snapshot_id>', methods=['GET'])
+def snapshot_detail(snapshot_id):
+    """Return a snapshot's printer -> config hash map and each distinct configuration once."""
+    snapshot = SNAPSHOTS.get(snapshot_id)
+    if snapshot is None:
+        return jsonify({'success': False, 'error': 'Snapshot not found'}), 404
+    return jsonify(snapshot)
+
+@app.route('/snapshots/<snapshot_id>/restore', methods=['POST'])
+def restore_snapshot(snapshot_id):
+    """Push a snapshot back to its printers (or a subset, or other printers with config_hash) in parallel."""
+    payload = request.get_json(silent=True) or request.form
+    try:
+        targets = expand_printer_targets(payload.get('printer_ips', []), payload.get('cidr'))
+        plan = SNAPSHOTS.restore_plan(snapshot_id, targets, payload.get('config_hash') or None)
+        max_workers = min(int(payload.get('max_workers', FLEET_MAX_WORKERS)), FLEET_MAX_WORKERS)
+        per_subnet_limit = max(1, int(payload.get('per_subnet_limit', FLEET_PER_SUBNET_LIMIT)))
+        http_port = int(payload.get('http_port', 80))
+        full = parse_detail(payload.get('detail'))
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Snapshot not found'}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
-    # Always test port 9100 regardless of ping
-    print(f"\nTesting printer port 9100...")
-    success, message = test_printer_port(printer_ip, 9100)
-    results['port_9100'] = success
-    results['details'].append(f'Printer port (9100): {message}')
+    # Snapshots hold web form fields, so they are restored through the web UI
+    result = configure_fleet(list(plan), payload.get('username', 'admin'), payload.get('password', '1234'),
+                             max_workers, per_subnet_limit, 'web', http_port, full,
+                             request_deadline(default=None), profiles=plan)
+    result['snapshot_id'] = snapshot_id
+    return jsonify(result)
 
-    # Test HTTP connection
+@app.route('/discover', methods=['GET', 'POST'])
+def discover_printers():
+    """Sweep a CIDR range for printers and stream each discovered device as an NDJSON line."""
+    params = request.get_json(silent=True) or request.values
+    cidr = (params.get('cidr') or '').strip()
+    zebra_only = str(params.get('zebra_only', 'true')).lower() not in ('0', 'false', 'no')
     try:
-        print(f"\nTesting HTTP connection to {printer_ip}...")
-        response = requests.get(f'http://{printer_ip}', timeout=5)
-        results['http'] = response.status_code == 200
-        results['details'].append(f'HTTP connection: Status {response.status_code}')
+        timeout = min(max(float(params.get('timeout', 0.5)), 0.05), 5.0)
+        discovery_targets(cidr)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def generate():
+        for item in iter_discovery(cidr, zebra_only=zebra_only, timeout=timeout):
+            yield json.dumps(item) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def http_check(printer_ip: str, timeout: float):
+    """Check the printer's web server for the connectivity probe."""
+    try:
+        response = requests.get(f'http://{printer_ip}', timeout=timeout)
+        return response.status_code == 200, f'HTTP connection: Status {response.status_code}'
     except requests.Timeout:
         print("HTTP connection timed out")
-        results['details'].append('HTTP connection timed out')
+        return False, 'HTTP connection timed out'
     except requests.ConnectionError as e:
         print(f"HTTP connection error: {e}")
-        results['details'].append(f'HTTP connection refused: {str(e)}')
+        return False, f'HTTP connection refused: {str(e)}'
     except requests.RequestException as e:
         print(f"HTTP request error: {e}")
-        results['details'].append(f'HTTP connection failed: {str(e)}')
+        return False, f'HTTP connection failed: {str(e)}'
+
+def monitor_probe(printer_ip: str) -> Dict:
+    """The fleet monitor's poll: the same checks as the connection test, refreshing its cache."""
+    return BREAKER.note_probe(printer_ip, cached_probe(printer_ip, http_check, refresh=True))
+
+# Polls registered printers in the background; /api/fleet answers from its in-memory status
+MONITOR = create_monitor(monitor_probe)
+
+@app.route('/api/fleet', methods=['GET'])
+def fleet_status():
+    """Status of every monitored printer from memory (history=1 adds each ring buffer); never probes."""
+    history = request.args.get('history', '').lower() in ('1', 'true', 'yes')
+    return jsonify(MONITOR.fleet(history))
+
+@app.route('/api/fleet', methods=['POST'])
+def monitor_printers():
+    """Register printers (a list or a CIDR range) with the background monitor."""
+    payload = request.get_json(silent=True) or request.form
+    try:
+        targets = expand_printer_targets(payload.get('printer_ips', []), payload.get('cidr'))
+        if not targets:
+            return jsonify({'success': False, 'error': 'At least one printer IP or a CIDR range is required'}), 400
+        added = MONITOR.register(targets)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'added': added, 'monitored': MONITOR.fleet()['total']})
+
+@app.route('/api/fleet/<printer_ip>', methods=['GET'])
+def printer_status(printer_ip):
+    """One monitored printer's status and history, from memory."""
+    status = MONITOR.status(printer_ip, history=True)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Printer is not monitored'}), 404
+    return jsonify(status)
+
+@app.route('/api/fleet/<printer_ip>', methods=['DELETE'])
+def unmonitor_printer(printer_ip):
+    """Stop monitoring a printer."""
+    if not MONITOR.unregister(printer_ip):
+        return jsonify({'success': False, 'error': 'Printer is not monitored'}), 404
+    return jsonify({'success': True})
+
+@app.route('/test_connection', methods=['POST'])
+def test_connection():
+    printer_ip = request.form.get('printer_ip', '').strip()
+    proxy_url = request.form.get('proxy_url', '').strip()
+    refresh = request.form.get('refresh', '').lower() in ('1', 'true', 'yes')
+    ping = request.form.get('ping', '').lower() in ('1', 'true', 'yes')
+    
+    try:
+        # Validate IP format
+        ipaddress.ip_address(printer_ip)
+    except ValueError:
+        return jsonify({'error': 'Invalid IP address format'}), 400
+    try:
+        ports = parse_ports(request.form.get('ports'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Probe port 9100 (plus any extra ports) and HTTP concurrently, served from cache when fresh
+        result = cached_probe(printer_ip, http_check, ports, refresh=refresh, ping=ping)
+        return jsonify(BREAKER.note_probe(printer_ip, result))
+            
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+def test_printer_port(ip, port, timeout=10):
+    """Test a specific printer port with a TCP connect from this process"""
+    outcome = check_tcp_port(ip, port, timeout)
+    print(f"Connect to {ip}:{port} {'succeeded' if outcome['open'] else 'failed'}")
+    return outcome['open'], f"Port {port} is {'open' if outcome['open'] else 'closed'}"
 
-    return results
+def test_printer_connection(printer_ip, ports=(9100,), deadline=PROBE_DEADLINE):
+    """Test printer connectivity: ping, the printer ports and HTTP, all at once under one deadline"""
+    ipaddress.ip_address(printer_ip)
+    return probe_printer(printer_ip, http_check, ports, deadline, ping=True)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,420 @@
+"""asyncio printer client: drives printers' web UIs and raw ports from one event loop instead of a thread each."""
+import asyncio
+import ipaddress
+import threading
+import time
+from dataclasses import dataclass
+from email.parser import Parser
+from http.cookies import CookieError, SimpleCookie
+from http.client import HTTPMessage
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+from circuit_breaker import BREAKER, PrinterUnreachable
+from deadlines import RETRY_POLICY, Deadline, DeadlineExceeded
+from inventory import INVENTORY
+from login_cache import LOGIN_CACHE, order_combinations
+from metrics import (LOGIN_ATTEMPTS, PRINTER_REQUEST_FAILURES, PRINTER_REQUEST_SECONDS,
+                     PRINTER_REQUEST_TIMEOUTS)
+from printer_config import SAVE_ENDPOINT, SAVE_FORM, SECTION_ENDPOINTS, CompiledProfile, get_profile
+from printer_forms import diff_fields, parse_form_fields
+from step_scheduler import detect_model
+
+REQUEST_TIMEOUT = 10.0
+READY_TIMEOUT = 1.0
+MAX_HEADER_LINES = 100
+
+class PrinterConnectionError(Exception):
+    """The printer could not be reached, or dropped the connection mid-exchange."""
+
+class PrinterTimeout(PrinterConnectionError):
+    """The printer did not answer within the request's timeout."""
+
+class HTTPError(Exception):
+    """The printer answered with an HTTP error status."""
+
+class PrinterResponse:
+    """A printer's answer to one HTTP request, with the parts of requests.Response the configuration uses."""
+
+    def __init__(self, status_code: int, reason: str, headers: HTTPMessage, content: bytes, url: str):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        charset = self.headers.get_content_charset() or 'utf-8'
+        try:
+            return self.content.decode(charset, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(f"{self.status_code} {self.reason} for url: {self.url}")
+
+@dataclass
+class RawResponse:
+    """Result of a raw port 9100 write; printers do not answer ZPL, so this records what was sent."""
+    payload: bytes
+
+    @property
+    def text(self) -> str:
+        return f"Sent {len(self.payload)} bytes: {self.payload.decode('ascii', errors='replace').strip()}"
+
+class AsyncHTTPConnection:
+    """One keep-alive HTTP/1.1 connection to a printer's web server; requests on it take turns.
+
+    Cookies the printer sets (its login session) are sent back on later requests, as requests.Session does.
+    """
+
+    def __init__(self, host: str, port: int = 80):
+        self.host = host
+        self.port = port
+        host_name = f"[{host}]" if ':' in host else host
+        self.host_header = host_name if port == 80 else f"{host_name}:{port}"
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self.cookies: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    async def request(self, method: str, path: str, body: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None, timeout: float = REQUEST_TIMEOUT) -> PrinterResponse:
+        """Send a request and read the whole response, reconnecting once if a kept-alive connection went stale."""
+        async with self._lock:
+            url = f"http://{self.host_header}{path}"
+            for attempt in range(2):
+                reused = self._writer is not None
+                try:
+                    return await asyncio.wait_for(self._exchange(method, path, body, headers or {}, url), timeout)
+                except asyncio.TimeoutError:
+                    self.close()
+                    raise PrinterTimeout(f"{method} {url} timed out after {timeout:.1f}s")
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    self.close()
+                    # The printer may have closed an idle connection just as it was reused
+                    if reused and attempt == 0 and isinstance(e, (ConnectionError, asyncio.IncompleteReadError)):
+                        continue
+                    raise PrinterConnectionError(f"{method} {url} failed: {e or type(e).__name__}")
+
+    async def _exchange(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str],
+                        url: str) -> PrinterResponse:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host_header}", "Accept-Encoding: identity",
+                 "Connection: keep-alive"]
+        if self.cookies:
+            lines.append("Cookie: " + "; ".join(f"{name}={value}" for name, value in self.cookies.items()))
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (body or b''))
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        version, status, reason = self._parse_status(status_line)
+        response_headers = await self._read_headers()
+        self._store_cookies(response_headers)
+        content, keep_alive = await self._read_body(method, status, version, response_headers)
+        if not keep_alive:
+            self.close()
+        return PrinterResponse(status, reason, response_headers, content, url)
+
+    @staticmethod
+    def _parse_status(line: bytes) -> Tuple[str, int, str]:
+        parts = line.decode('latin-1').rstrip('\r\n').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ValueError(f"Malformed status line: {line[:80]!r}")
+        return parts[0], int(parts[1]), parts[2] if len(parts) > 2 else ''
+
+    async def _read_headers(self) -> HTTPMessage:
+        lines = []
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n'):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            lines.append(line.decode('latin-1'))
+            if len(lines) > MAX_HEADER_LINES:
+                raise ValueError("Too many response headers")
+        return Parser(_class=HTTPMessage).parsestr(''.join(lines))
+
+    def _store_cookies(self, headers: HTTPMessage):
+        for header in headers.get_all('Set-Cookie') or []:
+            try:
+                cookie = SimpleCookie(header)
+            except CookieError:
+                continue
+            self.cookies.update((name, morsel.value) for name, morsel in cookie.items())
+
+    async def _read_body(self, method: str, status: int, version: str, headers: HTTPMessage) -> Tuple[bytes, bool]:
+        connection = (headers.get('Connection') or '').lower()
+        keep_alive = 'close' not in connection and (version != 'HTTP/1.0' or 'keep-alive' in connection)
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return b'', keep_alive
+        if 'chunked' in (headers.get('Transfer-Encoding') or '').lower():
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Skip any trailers
+                    while (await self._reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks), keep_alive
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+        length = headers.get('Content-Length')
+        if length is not None:
+            return await self._reader.readexactly(int(length)), keep_alive
+        # No length: the body runs until the printer closes the connection
+        return await self._reader.read(), False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+class AsyncZebraPrinter:
+    """asyncio counterpart of ZebraPrinter: the same operations as coroutines, on non-blocking sockets.
+
+    One event loop can configure thousands of printers at once; each printer keeps one connection.
+    """
+
+    TRANSPORTS = ('web', 'raw')
+
+    def __init__(self, ip_address: str, username: str = "admin", password: str = "1234",
+                 transport: str = 'web', raw_port: int = 9100, http_port: int = 80, deadline: Deadline = None,
+                 profile: CompiledProfile = None):
+        self.validate_ip_address(ip_address)
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Invalid transport: {transport}")
+        self.transport = transport
+        self.raw_port = raw_port
+        self.http_port = http_port
+        self.ip_address = ip_address
+        self.connection = AsyncHTTPConnection(ip_address, http_port)
+        self.base_url = f"http://{self.connection.host_header}"
+        self.config = profile or get_profile()
+        self._credentials = {"0": username, "1": password}
+        self.headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        self.model = 'unknown'
+        self.deadline = deadline or Deadline(None)
+
+    @staticmethod
+    def validate_ip_address(ip: str):
+        """Validate IP address format."""
+        try:
+            ipaddress.ip_address(ip)
+        except ValueError:
+            raise ValueError("Invalid IP address format")
+
+    async def __aenter__(self) -> 'AsyncZebraPrinter':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the kept-alive connection to the printer."""
+        self.connection.close()
+
+    async def _make_request(self, endpoint: str, data: Union[None, bytes, Dict], method: str = 'POST',
+                            idempotent: Optional[bool] = None) -> PrinterResponse:
+        """Make HTTP request with error handling, retrying idempotent requests on connection errors."""
+        if idempotent is None:
+            idempotent = method == 'GET'
+        try:
+            if idempotent:
+                response = await RETRY_POLICY.call_async(lambda: self._send_request(endpoint, data, method),
+                                                         (PrinterConnectionError,), self.deadline,
+                                                         f"{method} {endpoint}")
+            else:
+                response = await self._send_request(endpoint, data, method)
+            response.raise_for_status()
+            return response
+        except PrinterConnectionError as e:
+            raise PrinterUnreachable(f"Request failed: {str(e)}")
+        except HTTPError as e:
+            PRINTER_REQUEST_FAILURES.inc(endpoint=endpoint)
+            raise Exception(f"Request failed: {str(e)}")
+
+    async def _send_request(self, endpoint: str, data: Union[None, bytes, Dict], method: str) -> PrinterResponse:
+        """Send one request with a timeout that fits the deadline, recording its latency and outcome."""
+        # An exhausted deadline fails here, before the breaker hands out a half-open trial
+        timeout = self.deadline.timeout(REQUEST_TIMEOUT, f"{method} {endpoint}")
+        async with BREAKER.admission_async(self.ip_address, self.http_port):
+            path, body, headers = endpoint, None, {}
+            if method == 'POST':
+                # Profile payloads arrive already encoded
+                body = data if isinstance(data, bytes) else urlencode(data or {}).encode()
+                headers = self.headers
+            elif data:
+                path = f"{endpoint}?{urlencode(data)}"
+            started = time.monotonic()
+            try:
+                response = await self.connection.request(method, path, body, headers, timeout)
+            except PrinterConnectionError as e:
+                PRINTER_REQUEST_FAILURES.inc(endpoint=endpoint)
+                if isinstance(e, PrinterTimeout):
+                    PRINTER_REQUEST_TIMEOUTS.inc(endpoint=endpoint)
+                BREAKER.record_failure(self.ip_address, str(e))
+                raise
+            finally:
+                PRINTER_REQUEST_SECONDS.observe(time.monotonic() - started, endpoint=endpoint, method=method)
+            BREAKER.record_success(self.ip_address)
+        return response
+
+    async def _send_raw(self, payload: bytes) -> RawResponse:
+        """Write a ZPL payload to the raw printing port in a single send."""
+        timeout = self.deadline.timeout(REQUEST_TIMEOUT, "raw port write")
+        async with BREAKER.admission_async(self.ip_address, self.raw_port):
+
+            async def write():
+                _, writer = await asyncio.open_connection(self.ip_address, self.raw_port)
+                try:
+                    writer.write(payload)
+                    await writer.drain()
+                    writer.write_eof()
+                finally:
+                    writer.close()
+                    await writer.wait_closed()
+
+            try:
+                await asyncio.wait_for(write(), timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                error = str(e) or 'timed out'
+                BREAKER.record_failure(self.ip_address, error)
+                raise Exception(f"Raw port {self.raw_port} write failed: {error}")
+            BREAKER.record_success(self.ip_address)
+        return RawResponse(payload)
+
+    async def apply_configuration(self) -> RawResponse:
+        """Send the whole configuration, including the save, as one ZPL stream over the raw port."""
+        return await self._send_raw(self.config.zpl['all'])
+
+    async def login(self) -> PrinterResponse:
+        """Authenticate with the printer by trying different credential combinations."""
+        print("Attempting login with different credential combinations...")
+
+        # Try different combinations, starting with the one that worked last time
+        combinations = [
+            ({'1': self._credentials['1']}, "password only"),
+            ({'0': self._credentials['0']}, "username only"),
+            (self._credentials, "both username and password")
+        ]
+        # The login cache and the inventory write to disk under thread locks, so they run off the shared loop
+        cached = await asyncio.to_thread(LOGIN_CACHE.get, self.ip_address)
+
+        last_error = None
+        for creds, desc in order_combinations(combinations, cached):
+            try:
+                print(f"Trying {desc}...")
+                response = await self._make_request('/settings', creds)
+                if "Incorrect" not in response.text:
+                    LOGIN_ATTEMPTS.inc(combination=desc, result='success')
+                    print(f"Success with {desc}")
+                    self.model = detect_model(response.text, response.headers.get('Server', ''))
+                    if desc != cached:
+                        await asyncio.to_thread(LOGIN_CACHE.set, self.ip_address, desc)
+                    await asyncio.to_thread(INVENTORY.record_login, self.ip_address, desc, self.model)
+                    return response
+                LOGIN_ATTEMPTS.inc(combination=desc, result='rejected')
+                last_error = Exception(f"Credentials rejected with {desc}")
+            except (PrinterUnreachable, DeadlineExceeded):
+                # Other combinations cannot succeed against a printer that is down, or in the time left
+                raise
+            except Exception as e:
+                LOGIN_ATTEMPTS.inc(combination=desc, result='error')
+                last_error = e
+                print(f"Failed with {desc}: {str(e)}")
+            if desc == cached:
+                await asyncio.to_thread(LOGIN_CACHE.invalidate, self.ip_address)
+                cached = None
+
+        raise Exception(f"Login failed with all combinations: {str(last_error)}")
+
+    async def is_ready(self) -> bool:
+        """Cheap readiness probe: True once the printer's web server answers a HEAD request."""
+        try:
+            response = await self.connection.request(
+                'HEAD', '/', timeout=self.deadline.timeout(READY_TIMEOUT, "readiness probe"))
+            return response.status_code < 500
+        except (PrinterConnectionError, DeadlineExceeded):
+            return False
+
+    async def read_current_settings(self) -> Dict[str, Dict[str, str]]:
+        """Read the media and general setup pages and parse them into field-number maps."""
+        media = await self._make_request('/setmed', None, method='GET')
+        general = await self._make_request('/setgen', None, method='GET')
+        return {'media': parse_form_fields(media.text), 'general': parse_form_fields(general.text)}
+
+    def diff_configuration(self, current: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+        """Return only the media and general fields that differ from the current settings."""
+        return {
+            'media': diff_fields(current.get('media', {}), self.config.media),
+            'general': diff_fields(current.get('general', {}), self.config.general)
+        }
+
+    async def update_media_setup(self, fields: Optional[Dict[str, str]] = None):
+        """Update media configuration (only `fields` if given)."""
+        if self.transport == 'raw':
+            return await self._send_raw(self.config.zpl['media'])
+        return await self._make_request(SECTION_ENDPOINTS['media'], self.config.form('media', fields), idempotent=True)
+
+    async def update_general_setup(self, cutter_mode: bool = False, fields: Optional[Dict[str, str]] = None):
+        """Update general configuration (only `fields` if given)."""
+        if self.transport == 'raw':
+            return await self._send_raw(self.config.zpl['general'])
+        return await self._make_request(SECTION_ENDPOINTS['general'], self.config.form('general', fields),
+                                        idempotent=True)
+
+    async def save_settings(self):
+        """Save current configuration."""
+        if self.transport == 'raw':
+            return await self._send_raw(self.config.zpl['save'])
+        return await self._make_request(SAVE_ENDPOINT, SAVE_FORM, idempotent=True)
+
+    async def request_feed(self) -> PrinterResponse:
+        """Request paper feed."""
+        return await self._make_request('/feed', {"1": "1"})
+
+    async def print_test(self) -> PrinterResponse:
+        """Perform test print."""
+        return await self._make_request('/test_print', {"1": "1"})
+
+class PrinterLoop:
+    """A background event loop that blocking callers hand printer coroutines to."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='printer-loop', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and block until it finishes, returning its result or raising its error."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop or self._start()).result()
+
+    def call(self, function, *args):
+        """Run a plain function on the loop thread, for objects that belong to the loop."""
+        async def wrapper():
+            return function(*args)
+        return self.run(wrapper())
+
+# Every blocking ZebraPrinter in this process shares one loop, so waiting on printers costs no threads
+PRINTER_LOOP = PrinterLoop()
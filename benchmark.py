@@ -0,0 +1,175 @@
+"""Benchmark the configuration hot path against simulated printers.
+
+Reports single-printer configure latency, fleet throughput and local proxy concurrency, e.g.::
+
+    python benchmark.py --printers 50 --latency 0.02 --max-configure-p95 1.5
+
+Exits with status 1 if any --max-* threshold is exceeded, so it can gate regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep benchmark runs out of the operator's real login cache and inventory
+BENCH_DIR = tempfile.mkdtemp(prefix='zebra-bench-')
+os.environ.setdefault('ZEBRA_LOGIN_CACHE', os.path.join(BENCH_DIR, 'logins.json'))
+os.environ.setdefault('ZEBRA_INVENTORY', os.path.join(BENCH_DIR, 'inventory.sqlite3'))
+
+import local_proxy
+from printer_simulator import SimulatorSettings, start_fleet
+from TESTINGRENDER import ZebraPrinter, configure_fleet, run_printer_configuration
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'mean': round(statistics.mean(values), 4) if values else 0.0,
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'max': round(max(values), 4) if values else 0.0
+    }
+
+def reset_printer(printer):
+    """Put a simulated printer back on non-compliant settings so every run does real work."""
+    with printer.lock:
+        printer.media = dict(printer.settings.media)
+        printer.general = dict(printer.settings.general)
+
+def bench_single_printer(printer, iterations, transport):
+    """Configure one printer repeatedly and report latency."""
+    latencies = []
+    failures = 0
+    for _ in range(iterations):
+        reset_printer(printer)
+        with ZebraPrinter(printer.ip, printer.settings.username, printer.settings.password,
+                          transport=transport, http_port=printer.http_port, raw_port=printer.raw_port) as zebra:
+            started = time.monotonic()
+            result = run_printer_configuration(zebra)
+            latencies.append(time.monotonic() - started)
+        failures += 0 if result['success'] else 1
+    return dict(summarize(latencies), failures=failures)
+
+def bench_fleet(printers, transport):
+    """Configure the whole simulated fleet in parallel and report throughput."""
+    for printer in printers:
+        reset_printer(printer)
+    started = time.monotonic()
+    result = configure_fleet([p.ip for p in printers], transport=transport, http_port=printers[0].http_port)
+    wall = time.monotonic() - started
+    return {
+        'printers': len(printers),
+        'succeeded': result['succeeded'],
+        'wall_time': round(wall, 3),
+        'throughput': round(len(printers) / wall, 2) if wall else 0.0,
+        'per_printer': summarize([p['elapsed'] for p in result['printers']])
+    }
+
+def bench_proxy(printers, concurrency):
+    """Drive the local proxy with concurrent configure requests while timing a connection test."""
+    local_proxy.PRINTER_HTTP_PORT = printers[0].http_port
+    server = local_proxy.PooledHTTPServer(('127.0.0.1', 0), local_proxy.ProxyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    proxy_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def configure(printer):
+        reset_printer(printer)
+        request = urllib.request.Request(
+            f'{proxy_url}/configure',
+            data=f'username={printer.settings.username}&password={printer.settings.password}'.encode(),
+            headers={'X-Printer-IP': printer.ip, 'Content-Type': 'application/x-www-form-urlencoded'}
+        )
+        started = time.monotonic()
+        with urllib.request.urlopen(request, timeout=120) as response:
+            result = json.loads(response.read())
+        return time.monotonic() - started, result['success']
+
+    def probe():
+        started = time.monotonic()
+        urllib.request.urlopen(f'{proxy_url}/?printer_ip={printers[0].ip}&refresh=1', timeout=30).read()
+        return time.monotonic() - started
+
+    try:
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(configure, printer) for printer in printers]
+            time.sleep(0.05)
+            probe_latency = probe()
+            outcomes = [future.result() for future in futures]
+        wall = time.monotonic() - started
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'requests': len(outcomes),
+        'succeeded': sum(1 for _, ok in outcomes if ok),
+        'wall_time': round(wall, 3),
+        'throughput': round(len(outcomes) / wall, 2) if wall else 0.0,
+        'per_request': summarize([latency for latency, _ in outcomes]),
+        'probe_while_busy': round(probe_latency, 4)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark printer configuration against simulated printers.')
+    parser.add_argument('--printers', type=int, default=20, help='simulated fleet size')
+    parser.add_argument('--iterations', type=int, default=10, help='single-printer configure runs')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--transport', choices=ZebraPrinter.TRANSPORTS, default='web')
+    parser.add_argument('--base-ip', default='127.0.1.1')
+    parser.add_argument('--http-port', type=int, default=18080)
+    parser.add_argument('--raw-port', type=int, default=19100)
+    parser.add_argument('--proxy-concurrency', type=int, default=16)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--max-configure-p95', type=float, help='fail if single-printer p95 exceeds this (s)')
+    parser.add_argument('--max-fleet-wall', type=float, help='fail if fleet wall time exceeds this (s)')
+    parser.add_argument('--max-proxy-wall', type=float, help='fail if proxy wall time exceeds this (s)')
+    args = parser.parse_args()
+
+    settings = SimulatorSettings(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    printers = start_fleet(args.printers, args.base_ip, args.http_port, args.raw_port, settings, schemes=True)
+    try:
+        report = {
+            'settings': {'printers': args.printers, 'latency': args.latency, 'jitter': args.jitter,
+                         'error_rate': args.error_rate, 'transport': args.transport},
+            'single_printer': bench_single_printer(printers[0], args.iterations, args.transport),
+            'fleet': bench_fleet(printers, args.transport),
+            'proxy': bench_proxy(printers, args.proxy_concurrency)
+        }
+    finally:
+        for printer in printers:
+            printer.stop()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.max_configure_p95 is not None and report['single_printer']['p95'] > args.max_configure_p95:
+        failures.append(f"single-printer p95 {report['single_printer']['p95']}s > {args.max_configure_p95}s")
+    if args.max_fleet_wall is not None and report['fleet']['wall_time'] > args.max_fleet_wall:
+        failures.append(f"fleet wall time {report['fleet']['wall_time']}s > {args.max_fleet_wall}s")
+    if args.max_proxy_wall is not None and report['proxy']['wall_time'] > args.max_proxy_wall:
+        failures.append(f"proxy wall time {report['proxy']['wall_time']}s > {args.max_proxy_wall}s")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional, Tuple
+
+from metrics import REGISTRY, Counter, Gauge
+from probes import check_tcp_port, check_tcp_port_async
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('BREAKER_RESET_TIMEOUT', 30.0))
+PRECHECK_TIMEOUT = float(os.environ.get('PRECHECK_TIMEOUT', 0.5))
+# A host that answered this recently is not pre-checked again before the next request
+PRECHECK_TTL = float(os.environ.get('PRECHECK_TTL', 5.0))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+CIRCUIT_REJECTIONS = REGISTRY.register(Counter(
+    'zebra_circuit_rejections_total', 'Printer requests failed fast by an open circuit or a failed pre-check.',
+    ('reason',)))
+
+class PrinterUnreachable(Exception):
+    """Raised instead of sending a request to a printer that is known or found to be down."""
+
+class HostHealth:
+    """Circuit state and recent history for one printer."""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_success = 0.0
+        self.last_error: Optional[str] = None
+        # Token of the request let through while half-open, 0 when none is out
+        self.trial = 0
+
+class CircuitBreaker:
+    """Per-host circuit breaker with a quick TCP pre-check before heavy requests.
+
+    After `threshold` consecutive failures the circuit opens and requests fail immediately. Once
+    `reset_timeout` has passed, one request is let through (half-open); its outcome closes or re-opens it.
+    Requests run inside admission()/admission_async(), which hand the trial back however they end.
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT,
+                 precheck_timeout: float = PRECHECK_TIMEOUT, precheck_ttl: float = PRECHECK_TTL):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.precheck_timeout = precheck_timeout
+        self.precheck_ttl = precheck_ttl
+        self._hosts: Dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+        self._tokens = itertools.count(1)
+
+    def _health(self, host: str) -> HostHealth:
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth()
+        return health
+
+    def _admit(self, host: str) -> Tuple[int, bool]:
+        """Raise PrinterUnreachable if the circuit is open; otherwise the trial token (0 if not a trial)
+        and whether a pre-check is due."""
+        now = time.monotonic()
+        with self._lock:
+            health = self._health(host)
+            if health.state == OPEN:
+                if now - health.opened_at < self.reset_timeout:
+                    CIRCUIT_REJECTIONS.inc(reason='open')
+                    retry_in = self.reset_timeout - (now - health.opened_at)
+                    raise PrinterUnreachable(f"Printer {host} is unreachable (circuit open, retrying in "
+                                             f"{retry_in:.0f}s; last error: {health.last_error})")
+                health.state = HALF_OPEN
+                health.trial = 0
+            token = 0
+            if health.state == HALF_OPEN:
+                if health.trial:
+                    CIRCUIT_REJECTIONS.inc(reason='open')
+                    raise PrinterUnreachable(f"Printer {host} is unreachable (circuit half-open, trial in progress)")
+                token = health.trial = next(self._tokens)
+            return token, now - health.last_success > self.precheck_ttl
+
+    def _release(self, host: str, token: int):
+        """Hand back a trial that ended without a success or failure being recorded (deadline, cancellation...)."""
+        if token:
+            with self._lock:
+                health = self._health(host)
+                if health.trial == token:
+                    health.trial = 0
+
+    def _check_result(self, host: str, check: Dict):
+        if not check['open']:
+            self.record_failure(host, check['detail'])
+            CIRCUIT_REJECTIONS.inc(reason='precheck')
+            raise PrinterUnreachable(f"Printer {host} is unreachable ({check['detail']})")
+
+    @contextmanager
+    def admission(self, host: str, port: int):
+        """Run a request if the circuit allows it and the host passes a quick TCP connect.
+
+        Raises PrinterUnreachable otherwise. A half-open trial is released on every way out of the block.
+        """
+        token, precheck = self._admit(host)
+        try:
+            if precheck:
+                self._check_result(host, check_tcp_port(host, port, self.precheck_timeout))
+            yield
+        finally:
+            self._release(host, token)
+
+    @asynccontextmanager
+    async def admission_async(self, host: str, port: int):
+        """admission() for clients running on an event loop; the pre-check does not block the loop."""
+        token, precheck = self._admit(host)
+        try:
+            if precheck:
+                self._check_result(host, await check_tcp_port_async(host, port, self.precheck_timeout))
+            yield
+        finally:
+            self._release(host, token)
+
+    def record_success(self, host: str):
+        """The host answered (whatever the HTTP status), so close its circuit."""
+        with self._lock:
+            health = self._health(host)
+            health.state = CLOSED
+            health.failures = 0
+            health.trial = 0
+            health.last_success = time.monotonic()
+
+    def record_failure(self, host: str, error: str):
+        """A connection error or timeout; opens the circuit after enough of them in a row."""
+        with self._lock:
+            health = self._health(host)
+            health.failures += 1
+            health.last_error = error
+            health.trial = 0
+            if health.state == HALF_OPEN or health.failures >= self.threshold:
+                if health.state != OPEN:
+                    print(f"Circuit opened for {host} after {health.failures} failure(s): {error}")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    def note_probe(self, host: str, result: Dict) -> Dict:
+        """Close a printer's circuit when a fresh connectivity probe reached it; adds the circuit state to the result."""
+        if not result.get('cached') and (result.get('http') or result.get('port_9100')):
+            self.record_success(host)
+        return dict(result, circuit=self.state(host))
+
+    def state(self, host: str) -> Dict:
+        with self._lock:
+            health = self._hosts.get(host) or HostHealth()
+            return {'state': health.state, 'failures': health.failures, 'last_error': health.last_error}
+
+    def open_circuits(self) -> int:
+        with self._lock:
+            return sum(1 for health in self._hosts.values() if health.state != CLOSED)
+
+# Shared by every printer handled in this process
+BREAKER = CircuitBreaker()
+REGISTRY.register(Gauge('zebra_open_circuits', 'Printers whose circuit is open or half-open.',
+                        function=BREAKER.open_circuits))
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type
+
+# Remaining budget in milliseconds; relative, so the caller's and the proxy's clocks never need to agree
+DEADLINE_HEADER = 'X-Deadline-Ms'
+DEFAULT_BUDGET = float(os.environ.get('CONFIGURE_BUDGET', 120.0))
+MAX_BUDGET = float(os.environ.get('CONFIGURE_MAX_BUDGET', 600.0))
+# Time a relaying layer keeps for itself when it hands its budget on
+RELAY_RESERVE = float(os.environ.get('DEADLINE_RELAY_RESERVE', 1.0))
+
+RETRY_ATTEMPTS = int(os.environ.get('RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 0.2))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 2.0))
+
+class DeadlineExceeded(Exception):
+    """Raised when an operation's time budget has run out."""
+
+class Deadline:
+    """A point in time by which a whole operation, across every layer, must finish."""
+
+    def __init__(self, budget: Optional[float] = DEFAULT_BUDGET):
+        self.budget = budget
+        self.expires = None if budget is None else time.monotonic() + budget
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default: Optional[float] = DEFAULT_BUDGET) -> 'Deadline':
+        """Deadline from a caller's remaining-budget header, capped at MAX_BUDGET; `default` if there is none."""
+        try:
+            budget = float(value) / 1000.0
+        except (TypeError, ValueError):
+            budget = default
+        return cls(None if budget is None else max(0.0, min(budget, MAX_BUDGET)))
+
+    def remaining(self) -> float:
+        if self.expires is None:
+            return float('inf')
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, what: str = 'operation'):
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded before {what} ({self.budget:.1f}s budget)")
+
+    def timeout(self, default: float, what: str = 'request') -> float:
+        """The timeout for one call: its usual timeout, shortened to whatever budget is left."""
+        self.check(what)
+        return min(default, self.remaining())
+
+    def header(self, reserve: float = RELAY_RESERVE) -> str:
+        """Budget to hand to the next layer, keeping `reserve` seconds to receive and relay its answer."""
+        remaining = self.remaining()
+        if remaining == float('inf'):
+            remaining = MAX_BUDGET
+        return str(int(max(0.0, remaining - reserve) * 1000))
+
+class RetryPolicy:
+    """Retry idempotent calls with exponential backoff and full jitter, within a deadline."""
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _next_delay(self, attempt: int, deadline: Optional[Deadline]) -> Optional[float]:
+        """Backoff before the next attempt, or None if attempts or the deadline are used up."""
+        delay = self.backoff(attempt)
+        remaining = deadline.remaining() if deadline else float('inf')
+        if attempt == self.attempts - 1 or delay >= remaining:
+            return None
+        return delay
+
+    def call(self, operation: Callable, retry_on: Tuple[Type[BaseException], ...],
+             deadline: Optional[Deadline] = None, description: str = 'request'):
+        """Run `operation`, retrying on `retry_on` errors while attempts and the deadline allow."""
+        for attempt in range(self.attempts):
+            try:
+                return operation()
+            except retry_on as e:
+                delay = self._next_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                print(f"Retrying {description} in {delay:.2f}s after: {e}")
+                time.sleep(delay)
+
+    async def call_async(self, operation: Callable[[], Awaitable], retry_on: Tuple[Type[BaseException], ...],
+                         deadline: Optional[Deadline] = None, description: str = 'request'):
+        """call() for coroutines: `operation` returns a fresh awaitable per attempt."""
+        for attempt in range(self.attempts):
+            try:
+                return await operation()
+            except retry_on as e:
+                delay = self._next_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                print(f"Retrying {description} in {delay:.2f}s after: {e}")
+                await asyncio.sleep(delay)
+
+RETRY_POLICY = RetryPolicy()
@@ -0,0 +1,166 @@
+import asyncio
+import ipaddress
+import queue
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DISCOVERY_PORTS = (9100, 80)
+DISCOVERY_MAX_HOSTS = 4096
+DEFAULT_CONCURRENCY = 4096
+ZEBRA_MODEL_PATTERN = re.compile(r'\b(zebra|ZT\d{3}|ZD\d{3}|ZQ\d{3}|ZM\d{3}|ZE\d{3}|GK\d{3}|GX\d{3}|GT\d{3}|10[5-9]SL|1[17]0Xi)', re.IGNORECASE)
+
+def socket_budget(requested: int) -> int:
+    """Cap the number of concurrent sockets to what the process file descriptor limit allows."""
+    if resource is None:
+        return requested
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(16, min(requested, soft - 64))
+
+def parse_banner(raw: bytes) -> Dict[str, str]:
+    """Pull the Server header and page title out of a raw HTTP response."""
+    text = raw.decode('latin-1', errors='replace')
+    server = re.search(r'^Server:\s*(.+?)\r?$', text, re.IGNORECASE | re.MULTILINE)
+    title = re.search(r'<title>\s*([^<]+?)\s*</title>', text, re.IGNORECASE)
+    return {
+        'server': server.group(1).strip() if server else '',
+        'title': title.group(1).strip() if title else ''
+    }
+
+def identify_zebra(banner: Dict[str, str]) -> Optional[str]:
+    """Return the model/vendor string if the banner looks like a Zebra web UI, else None."""
+    for field in ('title', 'server'):
+        match = ZEBRA_MODEL_PATTERN.search(banner.get(field, ''))
+        if match:
+            return banner[field]
+    return None
+
+async def probe_port(ip: str, port: int, timeout: float) -> Optional[float]:
+    """Attempt a non-blocking TCP connect and return the connect latency in seconds, or None."""
+    started = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    latency = time.monotonic() - started
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return latency
+
+async def fetch_banner(ip: str, timeout: float, port: int = 80) -> Dict[str, str]:
+    """Fetch the first few KB of the printer's home page to identify the device."""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        writer.write(f'GET / HTTP/1.0\r\nHost: {ip}\r\nUser-Agent: zebra-discovery\r\n\r\n'.encode())
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(4096), timeout)
+        return parse_banner(raw)
+    except (OSError, asyncio.TimeoutError):
+        return {'server': '', 'title': ''}
+    finally:
+        if writer is not None:
+            writer.close()
+
+async def probe_host(ip: str, timeout: float, banner_timeout: float) -> Optional[Dict]:
+    """Probe the printer ports of one host; return a device record if anything answered."""
+    latencies = await asyncio.gather(*(probe_port(ip, port, timeout) for port in DISCOVERY_PORTS))
+    open_ports = {port: latency for port, latency in zip(DISCOVERY_PORTS, latencies) if latency is not None}
+    if not open_ports:
+        return None
+
+    banner = await fetch_banner(ip, banner_timeout) if 80 in open_ports else {'server': '', 'title': ''}
+    model = identify_zebra(banner)
+    return {
+        'ip': ip,
+        'port_9100': 9100 in open_ports,
+        'http': 80 in open_ports,
+        'zebra': model is not None,
+        'model': model or banner['title'] or None,
+        'server': banner['server'] or None,
+        'latency_ms': round(min(open_ports.values()) * 1000, 1)
+    }
+
+def discovery_targets(cidr: str):
+    """Validate a CIDR range and return its host addresses."""
+    try:
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+    except ValueError:
+        raise ValueError("Invalid CIDR range")
+    if network.num_addresses > DISCOVERY_MAX_HOSTS + 2:
+        raise ValueError(f"CIDR range exceeds the limit of {DISCOVERY_MAX_HOSTS} hosts")
+    return [str(host) for host in network.hosts()]
+
+async def discover(cidr: str, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 0.5,
+                   banner_timeout: float = 1.5) -> AsyncIterator[Dict]:
+    """Sweep a CIDR range and yield device records as soon as each host answers."""
+    hosts = discovery_targets(cidr)
+    # Each host holds one socket per discovery port while it is probed
+    limit = asyncio.Semaphore(max(1, socket_budget(concurrency) // len(DISCOVERY_PORTS)))
+    found = asyncio.Queue()
+
+    async def worker(ip):
+        async with limit:
+            await found.put(await probe_host(ip, timeout, banner_timeout))
+
+    tasks = [asyncio.ensure_future(worker(ip)) for ip in hosts]
+    try:
+        for _ in hosts:
+            device = await found.get()
+            if device is not None:
+                yield device
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def iter_discovery(cidr: str, zebra_only: bool = True, **kwargs) -> Iterator[Dict]:
+    """Run a discovery sweep on a background event loop and yield results synchronously.
+
+    The final item is a summary record with ``done`` set. Closing the iterator stops the sweep.
+    """
+    hosts = len(discovery_targets(cidr))
+    results = queue.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    async def consume():
+        async for device in discover(cidr, **kwargs):
+            if stop.is_set():
+                break
+            if device['zebra'] or not zebra_only:
+                results.put(device)
+
+    def run():
+        try:
+            asyncio.run(consume())
+        except Exception as e:
+            results.put({'error': str(e)})
+        finally:
+            results.put(finished)
+
+    started = time.monotonic()
+    threading.Thread(target=run, name='discovery', daemon=True).start()
+    found = 0
+    try:
+        while True:
+            item = results.get()
+            if item is finished:
+                break
+            if 'ip' in item:
+                found += 1
+            yield item
+        yield {'done': True, 'scanned': hosts, 'found': found, 'elapsed': round(time.monotonic() - started, 3)}
+    finally:
+        stop.set()
@@ -0,0 +1,241 @@
+import heapq
+import ipaddress
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from metrics import REGISTRY, Gauge
+
+MONITOR_INTERVAL = float(os.environ.get('MONITOR_INTERVAL', 30.0))
+MONITOR_MIN_INTERVAL = float(os.environ.get('MONITOR_MIN_INTERVAL', 5.0))
+MONITOR_MAX_INTERVAL = float(os.environ.get('MONITOR_MAX_INTERVAL', 300.0))
+# Each interval is spread by up to this fraction either way so probes never fire in lockstep
+MONITOR_JITTER = float(os.environ.get('MONITOR_JITTER', 0.2))
+MONITOR_HISTORY = int(os.environ.get('MONITOR_HISTORY', 60))
+MONITOR_WORKERS = int(os.environ.get('MONITOR_WORKERS', 8))
+MONITOR_MAX_PRINTERS = int(os.environ.get('MONITOR_MAX_PRINTERS', 4096))
+# Printers to watch from startup, comma-separated
+MONITOR_PRINTERS = os.environ.get('MONITOR_PRINTERS', '')
+
+# After this many steady probes in a row the interval starts growing again
+STABLE_STREAK = 3
+BACKOFF_FACTOR = 1.5
+
+class PrinterHealth:
+    """Polling state and a bounded ring buffer of recent results for one printer."""
+
+    def __init__(self, ip: str, interval: float, history: int):
+        self.ip = ip
+        self.interval = interval
+        self.history = deque(maxlen=history)
+        self.state = 'unknown'
+        self.since: Optional[float] = None
+        self.last_checked: Optional[float] = None
+        self.next_check: float = 0.0
+        self.streak = 0
+        self.ups = 0
+        self.changes = 0
+        self.last_detail: List[str] = []
+        self.latency_ms: Optional[float] = None
+        self.status: Dict = {}
+
+    def record(self, sample: Dict):
+        """Add a sample, keeping the up and state-change counts of the buffer current in O(1)."""
+        if len(self.history) == self.history.maxlen:
+            evicted = self.history[0]
+            self.ups -= evicted['up']
+            self.changes -= evicted['changed']
+        self.history.append(sample)
+        self.ups += sample['up']
+        self.changes += sample['changed']
+
+class FleetMonitor:
+    """Background poller for registered printers with adaptive, jittered intervals.
+
+    A printer whose state changes is polled at the minimum interval; one that keeps answering the same
+    way is polled less and less often, up to the maximum. Status is precomputed after every probe,
+    so reading it never touches the network.
+    """
+
+    def __init__(self, probe: Callable[[str], Dict], interval: float = MONITOR_INTERVAL,
+                 min_interval: float = MONITOR_MIN_INTERVAL, max_interval: float = MONITOR_MAX_INTERVAL,
+                 jitter: float = MONITOR_JITTER, history: int = MONITOR_HISTORY, workers: int = MONITOR_WORKERS,
+                 max_printers: int = MONITOR_MAX_PRINTERS):
+        self.probe = probe
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.history = history
+        self.max_printers = max_printers
+        self._printers: Dict[str, PrinterHealth] = {}
+        self._queue: List = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='monitor')
+        self._thread: Optional[threading.Thread] = None
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def register(self, ips: Iterable[str]) -> int:
+        """Start watching printers; the first probes are spread over one jitter window. Returns how many are new."""
+        added = 0
+        now = time.monotonic()
+        with self._lock:
+            for ip in ips:
+                if ip in self._printers:
+                    continue
+                if len(self._printers) >= self.max_printers:
+                    raise ValueError(f"Too many monitored printers (limit is {self.max_printers})")
+                health = PrinterHealth(ip, self.interval, self.history)
+                health.next_check = now + random.uniform(0, self.min_interval * self.jitter)
+                health.status = self._status(health)
+                self._printers[ip] = health
+                heapq.heappush(self._queue, (health.next_check, ip))
+                added += 1
+            if added:
+                self._wakeup.notify()
+        if added:
+            self._start()
+        return added
+
+    def unregister(self, ip: str) -> bool:
+        with self._lock:
+            # Its queue entry is dropped when it comes due
+            return self._printers.pop(ip, None) is not None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='fleet-monitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    self._wakeup.wait(timeout=self._queue[0][0] - time.monotonic() if self._queue else None)
+                due, ip = heapq.heappop(self._queue)
+                health = self._printers.get(ip)
+                if health is None or health.next_check != due:
+                    continue
+            self._executor.submit(self._check, health)
+
+    def _check(self, health: PrinterHealth):
+        try:
+            result = self.probe(health.ip)
+        except Exception as e:
+            result = {'port_9100': False, 'http': False, 'details': [f'Probe failed: {e}']}
+        self._update(health, result)
+
+    def _update(self, health: PrinterHealth, result: Dict):
+        now = time.time()
+        port_open, http_ok = bool(result.get('port_9100')), bool(result.get('http'))
+        if port_open or http_ok:
+            state = 'up' if port_open and http_ok else 'degraded'
+        else:
+            # A host that refused the connects still answered: its services are closed, but it is not down
+            state = 'closed' if result.get('reachable') else 'down'
+        latency = (result.get('ports', {}).get('9100') or {}).get('latency_ms')
+        with self._lock:
+            if self._printers.get(health.ip) is not health:
+                return  # unregistered while it was being probed
+            changed = health.state != 'unknown' and state != health.state
+            if changed or health.state == 'unknown':
+                health.state = state
+                health.since = now
+            health.record({'at': round(now, 3), 'state': state, 'up': int(state == 'up'), 'changed': int(changed),
+                           'latency_ms': latency})
+
+            # Flapping printers are watched closely; steady ones drift toward the maximum interval
+            if changed:
+                health.streak = 0
+                health.interval = self.min_interval
+            else:
+                health.streak += 1
+                if health.streak >= STABLE_STREAK:
+                    health.interval = min(self.max_interval, health.interval * BACKOFF_FACTOR)
+            health.last_checked = now
+            health.last_detail = result.get('details', [])
+            health.latency_ms = latency
+            health.next_check = time.monotonic() + self._jittered(health.interval)
+            health.status = self._status(health)
+            heapq.heappush(self._queue, (health.next_check, health.ip))
+            self._wakeup.notify()
+
+    @staticmethod
+    def _status(health: PrinterHealth) -> Dict:
+        samples = len(health.history)
+        return {
+            'ip': health.ip,
+            'state': health.state,
+            'since': health.since,
+            'last_checked': health.last_checked,
+            'interval': round(health.interval, 1),
+            'latency_ms': health.latency_ms,
+            'uptime': round(health.ups / samples, 3) if samples else None,
+            'flaps': health.changes,
+            'samples': samples,
+            'details': health.last_detail
+        }
+
+    def status(self, ip: str, history: bool = False) -> Optional[Dict]:
+        with self._lock:
+            health = self._printers.get(ip)
+            if health is None:
+                return None
+            status = dict(health.status, next_check_in=round(max(0.0, health.next_check - time.monotonic()), 1))
+            if history:
+                status['history'] = [{k: v for k, v in sample.items() if k != 'changed'} for sample in health.history]
+        return status
+
+    def fleet(self, history: bool = False) -> Dict:
+        """Every monitored printer's precomputed status, plus counts by state; answered from memory."""
+        with self._lock:
+            ips = list(self._printers)
+        printers = [status for status in (self.status(ip, history) for ip in ips) if status]
+        counts = {}
+        for status in printers:
+            counts[status['state']] = counts.get(status['state'], 0) + 1
+        return {'total': len(printers), 'states': counts, 'printers': printers}
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {}
+            for health in self._printers.values():
+                counts[health.state] = counts.get(health.state, 0) + 1
+            return counts
+
+def parse_monitor_targets(value) -> List[str]:
+    """Printer IPs from a list or a comma/space separated string, validated and de-duplicated."""
+    if isinstance(value, str):
+        value = value.replace(',', ' ').split()
+    if not isinstance(value, list):
+        raise ValueError("printer_ips must be a list or a comma-separated string")
+    ips = list(dict.fromkeys(str(ip).strip() for ip in value if str(ip).strip()))
+    for ip in ips:
+        ipaddress.ip_address(ip)
+    return ips
+
+# Every monitor created in this process; the Flask app and the proxy may each have one
+MONITORS: List[FleetMonitor] = []
+
+def _count(state: Optional[str] = None) -> int:
+    return sum(count for monitor in MONITORS for key, count in monitor.counts().items() if state in (None, key))
+
+REGISTRY.register(Gauge('zebra_monitored_printers', 'Printers watched by the fleet monitors.', function=_count))
+REGISTRY.register(Gauge('zebra_monitored_printers_down', 'Monitored printers that did not answer their last probe.',
+                        function=lambda: _count('down')))
+
+def create_monitor(probe: Callable[[str], Dict]) -> FleetMonitor:
+    """A monitor for this process, watching MONITOR_PRINTERS from the start."""
+    monitor = FleetMonitor(probe)
+    MONITORS.append(monitor)
+    if MONITOR_PRINTERS:
+        monitor.register(parse_monitor_targets(MONITOR_PRINTERS))
+    return monitor
@@ -0,0 +1,204 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+INVENTORY_PATH = os.environ.get('ZEBRA_INVENTORY', os.path.expanduser('~/.zebra_inventory.sqlite3'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS printers (
+    ip TEXT PRIMARY KEY,
+    mac TEXT,
+    model TEXT,
+    reachable INTEGER,
+    last_probe TEXT,
+    last_probe_at REAL,
+    last_seen_at REAL,
+    credential_scheme TEXT,
+    config_hash TEXT,
+    configured_at REAL,
+    last_configure_seconds REAL,
+    latency_count INTEGER NOT NULL DEFAULT 0,
+    latency_mean REAL,
+    latency_m2 REAL NOT NULL DEFAULT 0,
+    latency_min REAL,
+    latency_max REAL,
+    latency_last REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS printers_mac ON printers (mac);
+CREATE INDEX IF NOT EXISTS printers_config_hash ON printers (config_hash);
+CREATE INDEX IF NOT EXISTS printers_reachable ON printers (reachable, last_seen_at);
+"""
+
+def lookup_mac(ip: str) -> Optional[str]:
+    """MAC address of a printer on the local segment from the kernel ARP table, when available."""
+    try:
+        with open('/proc/net/arp', 'r', encoding='ascii') as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if len(fields) >= 4 and fields[0] == ip and fields[3] != '00:00:00:00:00:00':
+                    return fields[3].lower()
+    except OSError:
+        pass
+    return None
+
+class Inventory:
+    """Persistent SQLite record of every printer seen: probes, login scheme, applied config and latency.
+
+    Credentials are never stored, only the name of the combination the printer accepted.
+    """
+
+    def __init__(self, path: str = INVENTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        try:
+            self._db.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.DatabaseError:
+            pass
+        self._db.executescript(SCHEMA)
+
+    def _upsert(self, ip: str, **columns):
+        columns.setdefault('created_at', time.time())
+        names = ', '.join(columns)
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f'{name} = excluded.{name}' for name in columns if name != 'created_at')
+        self._db.execute(
+            f'INSERT INTO printers (ip, {names}) VALUES (?, {placeholders}) '
+            f'ON CONFLICT (ip) DO UPDATE SET {updates}',
+            (ip, *columns.values())
+        )
+
+    def _write(self, ip: str, **columns):
+        try:
+            with self._lock:
+                self._upsert(ip, **columns)
+        except sqlite3.Error as e:
+            print(f"Could not update inventory {self.path}: {e}")
+
+    def record_probe(self, ip: str, result: Dict):
+        """Store a connectivity probe result and fold its round trip into the latency statistics."""
+        now = time.time()
+        reachable = bool(result.get('port_9100') or result.get('http'))
+        columns = {'reachable': int(reachable), 'last_probe': json.dumps(result), 'last_probe_at': now}
+        if reachable:
+            columns['last_seen_at'] = now
+            mac = lookup_mac(ip)
+            if mac:
+                columns['mac'] = mac
+        try:
+            with self._lock:
+                self._upsert(ip, **columns)
+                if reachable and result.get('elapsed') is not None:
+                    self._add_latency(ip, float(result['elapsed']))
+        except sqlite3.Error as e:
+            print(f"Could not update inventory {self.path}: {e}")
+
+    def _add_latency(self, ip: str, seconds: float):
+        # Welford's online mean/variance, so no per-sample rows are kept
+        row = self._db.execute('SELECT latency_count, latency_mean, latency_m2, latency_min, latency_max '
+                               'FROM printers WHERE ip = ?', (ip,)).fetchone()
+        count = row['latency_count'] + 1
+        mean = row['latency_mean'] or 0.0
+        delta = seconds - mean
+        mean += delta / count
+        m2 = row['latency_m2'] + delta * (seconds - mean)
+        self._db.execute(
+            'UPDATE printers SET latency_count = ?, latency_mean = ?, latency_m2 = ?, latency_min = ?, '
+            'latency_max = ?, latency_last = ? WHERE ip = ?',
+            (count, mean, m2, min(seconds, row['latency_min'] if row['latency_min'] is not None else seconds),
+             max(seconds, row['latency_max'] or 0.0), seconds, ip)
+        )
+
+    def record_login(self, ip: str, scheme: str, model: str = None):
+        """Remember the credential combination a printer accepted."""
+        now = time.time()
+        columns = {'credential_scheme': scheme, 'reachable': 1, 'last_seen_at': now}
+        if model and model != 'unknown':
+            columns['model'] = model
+        self._write(ip, **columns)
+
+    def record_configuration(self, ip: str, config_hash: str, seconds: float):
+        """Record that a configuration profile was applied successfully."""
+        now = time.time()
+        self._write(ip, config_hash=config_hash, configured_at=now, last_configure_seconds=round(seconds, 3),
+                    reachable=1, last_seen_at=now)
+
+    def get(self, ip: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute('SELECT * FROM printers WHERE ip = ?', (ip,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def all(self) -> List[Dict]:
+        return self._query('SELECT * FROM printers ORDER BY ip')
+
+    def not_on_profile(self, config_hash: str) -> List[Dict]:
+        """Printers whose last applied configuration is not the given profile (or that were never configured)."""
+        # "IS NULL OR !=" cannot use an index, so the NULL and the two ranges around the hash are searched
+        # separately; most of a fleet is usually on the profile and never read
+        return self._query('SELECT * FROM printers INDEXED BY printers_config_hash WHERE config_hash IS NULL '
+                           'UNION ALL SELECT * FROM printers INDEXED BY printers_config_hash WHERE config_hash < ? '
+                           'UNION ALL SELECT * FROM printers INDEXED BY printers_config_hash WHERE config_hash > ? '
+                           'ORDER BY ip', (config_hash, config_hash))
+
+    def unreachable_for(self, seconds: float) -> List[Dict]:
+        """Printers whose latest probe failed and that have not been seen for at least `seconds`."""
+        cutoff = time.time() - seconds
+        return self._query('SELECT * FROM printers WHERE reachable = 0 AND '
+                           '(last_seen_at IS NULL OR last_seen_at < ?) ORDER BY ip', (cutoff,))
+
+    def needs_configuration(self, ips: Iterable[str], config_hash: str) -> List[str]:
+        """Filter IPs down to those not known to be on the profile already, keeping their order."""
+        ips = list(ips)
+        with self._lock:
+            compliant = {row['ip'] for row in self._db.execute(
+                'SELECT ip FROM printers WHERE config_hash = ?', (config_hash,))}
+        return [ip for ip in ips if ip not in compliant]
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        data = dict(row)
+        data['last_probe'] = json.loads(data['last_probe']) if data['last_probe'] else None
+        count = data.pop('latency_count')
+        m2 = data.pop('latency_m2')
+        mean = data.pop('latency_mean')
+        data['latency'] = {
+            'count': count,
+            'mean': round(mean, 4) if count else None,
+            'stdev': round((m2 / (count - 1)) ** 0.5, 4) if count > 1 else None,
+            'min': data.pop('latency_min'),
+            'max': data.pop('latency_max'),
+            'last': data.pop('latency_last')
+        }
+        return data
+
+def query_inventory(params: Dict[str, str], current_hash: str, profiles: Dict[str, str] = None,
+                    inventory: 'Inventory' = None) -> Dict:
+    """Answer an inventory query from request parameters: not_on_profile=<hash> or unreachable_for=<seconds>.
+
+    not_on_profile=current means the profile this server applies by default; a name from `profiles`
+    (name -> hash) means that profile.
+    """
+    inventory = inventory or INVENTORY
+    if params.get('not_on_profile'):
+        wanted = params['not_on_profile']
+        if wanted == 'current':
+            wanted = current_hash
+        printers = inventory.not_on_profile((profiles or {}).get(wanted, wanted))
+    elif params.get('unreachable_for'):
+        printers = inventory.unreachable_for(float(params['unreachable_for']))
+    else:
+        printers = inventory.all()
+    return {'count': len(printers), 'printers': printers}
+
+# Shared by every printer handled in this process
+INVENTORY = Inventory()
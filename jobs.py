@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 8))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 64))
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', 3600))
+JOB_MAX_FINISHED = int(os.environ.get('JOB_MAX_FINISHED', 500))
+
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+class Job:
+    """A unit of background work whose progress is recorded as a list of events."""
+
+    def __init__(self, description: str, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.params = params
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events: List[Dict] = []
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = threading.Event()
+        self.future = None
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def add_event(self, event: Dict):
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def set_status(self, status: str):
+        with self._changed:
+            self.status = status
+            if status == 'running':
+                self.started = time.time()
+            elif status in FINISHED_STATES:
+                self.finished = time.time()
+            self._changed.notify_all()
+
+    def wait_for_events(self, since: int, timeout: float) -> List[Dict]:
+        """Block until there are events after index `since`, the job finishes, or the timeout expires."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > since or self.done, timeout)
+            return self.events[since:]
+
+    def to_dict(self, include_events: bool = False) -> Dict:
+        data = {
+            'job_id': self.id,
+            'description': self.description,
+            'params': self.params,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'progress': len(self.events),
+            'result': self.result,
+            'error': self.error
+        }
+        if include_events:
+            data['events'] = list(self.events)
+        return data
+
+class JobManager:
+    """Run jobs on a bounded background pool, keeping finished jobs for a retention period."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 retention: float = JOB_RETENTION, max_finished: int = JOB_MAX_FINISHED):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_finished = max_finished
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, run: Callable[[], Iterator[Dict]], description: str, params: Dict = None) -> Job:
+        """Queue a job. `run` returns an iterator of events; an event of type 'result' is the job result."""
+        job = Job(description, params or {})
+        with self._lock:
+            self._prune()
+            active = sum(1 for j in self._jobs.values() if not j.done)
+            if active >= self.max_workers + self.max_pending:
+                raise JobQueueFull(f"Job queue is full ({active} jobs queued or running)")
+            self._jobs[job.id] = job
+            job.future = self.executor.submit(self._run, job, run)
+        return job
+
+    def _run(self, job: Job, run: Callable[[], Iterator[Dict]]):
+        if job.cancel_requested.is_set():
+            job.set_status('cancelled')
+            return
+        job.set_status('running')
+        events = run()
+        try:
+            for event in events:
+                job.add_event(event)
+                if event.get('type') == 'result':
+                    job.result = {k: v for k, v in event.items() if k != 'type'}
+                # Cancellation takes effect between events, e.g. between configuration steps
+                if job.cancel_requested.is_set():
+                    break
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            close = getattr(events, 'close', None)
+            if close:
+                close()
+
+        if job.cancel_requested.is_set() and job.result is None:
+            job.set_status('cancelled')
+        elif job.error or not (job.result or {}).get('success', False):
+            job.set_status('failed')
+        else:
+            job.set_status('succeeded')
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            self._prune()
+            return sorted(self._jobs.values(), key=lambda job: job.created, reverse=True)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of retained jobs in each state."""
+        with self._lock:
+            counts = {state: 0 for state in ('queued', 'running') + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation; queued jobs never start, running jobs stop after their current step."""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            job.set_status('cancelled')
+        return job
+
+    def subscribe(self, job_id: str, timeout: float = 15.0) -> Iterator[Dict]:
+        """Yield a job's events as they happen, then a final status event once it finishes.
+
+        Yields a keep-alive event if nothing happened for `timeout` seconds.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        seen = 0
+        while True:
+            events = job.wait_for_events(seen, timeout)
+            seen += len(events)
+            for event in events:
+                yield event
+            if job.done and seen >= len(job.events):
+                yield {'type': 'status', 'status': job.status, 'job_id': job.id}
+                return
+            if not events:
+                yield {'type': 'keepalive'}
+
+    def _prune(self):
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished:
+            if now - job.finished > self.retention:
+                del self._jobs[job.id]
+        finished = sorted((job for job in finished if job.id in self._jobs), key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
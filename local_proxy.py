@@ -1,15 +1,563 @@
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import urllib.request
+import urllib.error
 import json
 import socket
 import urllib.parse
+import http.client
+import http.cookiejar
 import time
+import os
+import ipaddress
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from step_scheduler import StepScheduler, detect_model, paced_steps
+from login_cache import LOGIN_CACHE, order_combinations
+from probes import cached_probe, parse_ports
+from responses import gzip_body, parse_detail, summarize_response
+from inventory import INVENTORY, query_inventory
+from fleet_monitor import create_monitor, parse_monitor_targets
+from circuit_breaker import BREAKER, PrinterUnreachable
+from deadlines import DEADLINE_HEADER, RETRY_POLICY, Deadline, DeadlineExceeded
+from printer_locks import PRINTER_LOCKS, PrinterBusy, configuration_key
+from printer_config import (PROFILES, SAVE_ENDPOINT, SAVE_FORM, SECTION_ENDPOINTS, get_profile, profile_hashes,
+                            resolve_profile)
+from metrics import (CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Gauge, LOGIN_ATTEMPTS,
+                     PRINTER_REQUEST_FAILURES, PRINTER_REQUEST_SECONDS, PRINTER_REQUEST_TIMEOUTS,
+                     instrument_configuration)
+
+PROXY_MAX_WORKERS = int(os.environ.get('PROXY_MAX_WORKERS', 32))
+PRINTER_IDLE_TIMEOUT = float(os.environ.get('PRINTER_IDLE_TIMEOUT', 60))
+PRINTER_HTTP_PORT = int(os.environ.get('PRINTER_HTTP_PORT', 80))
+PROXY_BATCH_WORKERS = int(os.environ.get('PROXY_BATCH_WORKERS', 16))
+PROXY_BATCH_MAX_PRINTERS = int(os.environ.get('PROXY_BATCH_MAX_PRINTERS', 1024))
+
+PROXY_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'zebra_proxy_requests_in_flight', 'Proxy HTTP requests currently being handled.'))
+
+PrinterResponse = namedtuple('PrinterResponse', ['status', 'headers', 'body'])
+
+class PrinterClient:
+    """Keep-alive HTTP client for one printer, with a cookie jar that carries the login session."""
+
+    def __init__(self, host, port=80, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.last_used = time.monotonic()
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self, timeout):
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        elif self._connection.sock is not None:
+            self._connection.sock.settimeout(timeout)
+        self._connection.timeout = timeout
+        return self._connection
+
+    def request(self, method, path, data=None, timeout=None, guarded=True):
+        """Send a request over the pooled connection, reconnecting once if it went stale.
+
+        Guarded requests fail fast with PrinterUnreachable while the printer's circuit is open.
+        """
+        timeout = timeout or self.timeout
+        url = f'http://{self.host}:{self.port}{path}'
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data is not None else {}
+
+        # Let the cookie jar decide which cookies to send
+        cookie_request = urllib.request.Request(url, headers=headers, method=method)
+        self.cookies.add_cookie_header(cookie_request)
+        headers = dict(cookie_request.header_items())
+
+        with BREAKER.admission(self.host, self.port) if guarded else nullcontext():
+            started = time.monotonic()
+            try:
+                with self._lock:
+                    response, body = self._send(method, path, data, headers, timeout)
+            except Exception as e:
+                if guarded and isinstance(e, (OSError, http.client.HTTPException)):
+                    BREAKER.record_failure(self.host, str(e))
+                if isinstance(e, socket.timeout):
+                    PRINTER_REQUEST_TIMEOUTS.inc(endpoint=path)
+                PRINTER_REQUEST_FAILURES.inc(endpoint=path)
+                raise
+            finally:
+                PRINTER_REQUEST_SECONDS.observe(time.monotonic() - started, endpoint=path, method=method)
+            BREAKER.record_success(self.host)
+
+        self.cookies.extract_cookies(response, cookie_request)
+        return PrinterResponse(response.status, response.headers, body)
+
+    def _send(self, method, path, data, headers, timeout):
+        """Send one request, retrying once on a fresh connection if a reused one went stale."""
+        for attempt in range(2):
+            reused = self._connection is not None and self._connection.sock is not None
+            connection = self._connect(timeout)
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                body = response.read().decode(errors='replace')
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest, http.client.ResponseNotReady):
+                self.close_connection()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                self.close_connection()
+                raise
+            if response.will_close:
+                self.close_connection()
+            break
+        self.last_used = time.monotonic()
+        return response, body
+
+    def close_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+class PrinterClientPool:
+    """Shared PrinterClient per printer host, closing connections that sit idle too long.
+
+    A background thread sweeps the pool every quarter of `idle_timeout`, so idle sockets are
+    closed even when no further requests arrive.
+    """
+
+    def __init__(self, idle_timeout=PRINTER_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def get(self, host):
+        with self._lock:
+            if host not in self._clients:
+                self._clients[host] = PrinterClient(host, PRINTER_HTTP_PORT)
+                self._start()
+            client = self._clients[host]
+            # A client just handed out is not idle, even before its request starts
+            client.last_used = time.monotonic()
+            return client
+
+    def _start(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._run, name='printer-client-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.idle_timeout / 4)
+            self.evict_idle()
+
+    def evict_idle(self):
+        """Close and drop every client idle for longer than `idle_timeout`; returns how many."""
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            for host, client in list(self._clients.items()):
+                # A client in the middle of a request is skipped until the next sweep
+                if now - client.last_used <= self.idle_timeout or not client._lock.acquire(blocking=False):
+                    continue
+                try:
+                    client.close_connection()
+                    del self._clients[host]
+                    evicted += 1
+                finally:
+                    client._lock.release()
+        return evicted
+
+PRINTER_CLIENTS = PrinterClientPool()
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles each connection on a bounded pool of worker threads."""
+
+    def __init__(self, server_address, handler_class, max_workers=PROXY_MAX_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='proxy')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            with PROXY_REQUESTS_IN_FLIGHT.track_inprogress():
+                self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def printer_ready(printer_ip):
+    """Cheap readiness probe: True once the printer's web server answers a HEAD request."""
+    try:
+        # Readiness polls expect refusals while the printer restarts, so they don't count against it
+        return PRINTER_CLIENTS.get(printer_ip).request('HEAD', '/', timeout=1, guarded=False).status < 500
+    except Exception:
+        return False
+
+def http_check(printer_ip, timeout):
+    """Check the printer's web server for the connectivity probe.
+
+    Uses a connection of its own: the pooled one may be held by a configuration step for seconds,
+    and a probe queued behind it would report a healthy printer as down.
+    """
+    connection = http.client.HTTPConnection(printer_ip, PRINTER_HTTP_PORT, timeout=timeout)
+    try:
+        connection.request('GET', '/')
+        response = connection.getresponse()
+        response.read()
+        http_result = response.status == 200
+    except Exception:
+        http_result = False
+    finally:
+        connection.close()
+    return http_result, f'HTTP: {"Connected" if http_result else "Failed"}'
+
+# Polls registered printers in the background with the same checks as the probe; /api/fleet reads its memory
+MONITOR = create_monitor(lambda printer_ip: BREAKER.note_probe(printer_ip,
+                                                               cached_probe(printer_ip, http_check, refresh=True)))
+
+def iter_configuration(printer_ip, username, password, full=False, profile=None, deadline=None):
+    """Log in to a printer and run the configuration steps, yielding a progress event per step.
+
+    The last event has type 'result' and carries the same summary configure_printer() returns.
+    Steps describe printer responses compactly unless `full` asks for the whole page, and every
+    request and wait is sized to fit what is left of `deadline`. `profile` is a compiled profile
+    (the default one if not given) whose payloads are sent as they are.
+    """
+    return instrument_configuration(_configuration_steps(printer_ip, username, password, full, profile, deadline))
+
+def _configuration_steps(printer_ip, username, password, full=False, profile=None, deadline=None):
+    profile = profile or get_profile()
+    deadline = deadline or Deadline(None)
+    print(f"Attempting to configure printer at {printer_ip}")
+    started = time.monotonic()
+    yield {'type': 'step_started', 'step': 'Login'}
+
+    # Try different login combinations, starting with the one that worked last time
+    print("Trying different login combinations...")
+    combinations = [
+        ({'1': password}, "password only"),
+        ({'0': username}, "username only"),
+        ({'0': username, '1': password}, "both username and password")
+    ]
+
+    client = PRINTER_CLIENTS.get(printer_ip)
+    cached = LOGIN_CACHE.get(printer_ip)
+    login_data = None
+    login_response = None
+    unreachable = None
+    model = 'unknown'
+    for creds, desc in order_combinations(combinations, cached):
+        try:
+            print(f"\nTrying {desc}")
+            check_data = urllib.parse.urlencode(creds).encode()
+            check_response = client.request('POST', '/settings', check_data, timeout=deadline.timeout(10, 'login'))
+            response_data = check_response.body
+
+            if check_response.status == 200 and "Incorrect" not in response_data:
+                LOGIN_ATTEMPTS.inc(combination=desc, result='success')
+                print(f"Success with {desc}")
+                login_data = check_data
+                login_response = summarize_response(response_data, check_response.status, full)
+                model = detect_model(response_data, check_response.headers.get('Server', ''))
+                if desc != cached:
+                    LOGIN_CACHE.set(printer_ip, desc)
+                INVENTORY.record_login(printer_ip, desc, model)
+                break
+            LOGIN_ATTEMPTS.inc(combination=desc, result='rejected')
+
+        except (PrinterUnreachable, DeadlineExceeded, OSError, http.client.HTTPException) as e:
+            # Other combinations cannot succeed against a printer that is down or not answering in time
+            print(str(e))
+            unreachable = e
+            break
+        except Exception as e:
+            LOGIN_ATTEMPTS.inc(combination=desc, result='error')
+            print(f"Failed with {desc}: {str(e)}")
+
+        if desc == cached:
+            LOGIN_CACHE.invalidate(printer_ip)
+            cached = None
+
+    # If no combination worked, use both as fallback
+    if not login_data and unreachable is None:
+        print("No login combination worked, using both as fallback")
+        login_data = urllib.parse.urlencode({'0': username, '1': password}).encode()
+
+    # Define configuration steps with debug logging
+    config_steps = [
+        {
+            'name': 'Login',
+            'path': '/settings',
+            'data': login_data
+        },
+        {
+            'name': 'Media Setup',
+            'path': SECTION_ENDPOINTS['media'],
+            'data': profile.forms['media'],
+            'idempotent': True
+        },
+        {
+            'name': 'General Setup',
+            'path': SECTION_ENDPOINTS['general'],
+            'data': profile.forms['general'],
+            'idempotent': True
+        },
+        {
+            'name': 'Save Settings',
+            'path': SAVE_ENDPOINT,
+            'data': SAVE_FORM,
+            'idempotent': True
+        }
+    ]
+
+    # Execute configuration steps
+    steps_results = []
+
+    scheduler = StepScheduler(lambda: printer_ready(printer_ip), model, deadline=deadline)
+
+    if unreachable is not None:
+        steps_results.append({
+            'step': 'Login',
+            'status': 'error',
+            'error': str(unreachable),
+            'elapsed': round(time.monotonic() - started, 3)
+        })
+        yield dict(steps_results[-1], type='step')
+        config_steps = []
+
+    # A successful login check already logged in, so don't POST the credentials again
+    if login_response is not None:
+        steps_results.append(dict(
+            {'step': 'Login', 'status': 'success'},
+            **login_response,
+            elapsed=round(time.monotonic() - started, 3)
+        ))
+        yield dict(steps_results[-1], type='step')
+        config_steps = config_steps[1:]
+        scheduler.wait_ready()
+
+    for index, step in enumerate(config_steps):
+        if step['name'] != 'Login':
+            yield {'type': 'step_started', 'step': step['name']}
+        step_started = time.monotonic()
+        try:
+            print(f"\nExecuting {step['name']}")
+            print(f"URL: http://{printer_ip}{step['path']}")
+            print(f"Data: {step['data'].decode()}")
+
+            def send(step=step):
+                return client.request('POST', step['path'], step['data'], timeout=deadline.timeout(10, step['name']))
+
+            # Re-posting a settings form is harmless, so those steps retry on connection errors
+            if step.get('idempotent'):
+                response = RETRY_POLICY.call(send, (OSError, http.client.HTTPException), deadline, step['name'])
+            else:
+                response = send()
+            response_data = response.body
+            summary = summarize_response(response_data, response.status, full)
+            print(f"Response Code: {response.status} ({summary['bytes']} bytes)")
+
+            success = response.status == 200 and "Error" not in response_data
+            steps_results.append(dict(
+                {'step': step['name'], 'status': 'success' if success else 'error'},
+                **summary,
+                elapsed=round(time.monotonic() - step_started, 3)
+            ))
+            yield dict(steps_results[-1], type='step')
+
+            if not success:
+                print(f"Step failed: {summary.get('message', 'no message')}")
+                break
+
+            # Wait for the printer to settle before the next step (none needed after the last)
+            if index < len(config_steps) - 1:
+                scheduler.wait_ready()
+
+        except Exception as e:
+            error_msg = f"Error in {step['name']}: {str(e)}"
+            print(error_msg)
+            steps_results.append({
+                'step': step['name'],
+                'status': 'error',
+                'error': str(e),
+                'elapsed': round(time.monotonic() - step_started, 3)
+            })
+            yield dict(steps_results[-1], type='step')
+            break
+
+    outcome = {
+        'type': 'result',
+        'success': all(step['status'] == 'success' for step in steps_results),
+        'steps': steps_results,
+        'elapsed': round(time.monotonic() - started, 3),
+        'wait': scheduler.report(steps=paced_steps(steps_results))
+    }
+    if outcome['success']:
+        outcome['profile'] = {'name': profile.name, 'version': profile.version}
+        outcome['config_hash'] = profile.hash
+        INVENTORY.record_configuration(printer_ip, outcome['config_hash'], outcome['elapsed'])
+    yield outcome
+
+def configure_printer(printer_ip, username, password, full=False, profile=None, deadline=None):
+    """Log in to a printer and run the configuration steps, returning the step results."""
+    for event in iter_configuration(printer_ip, username, password, full, profile, deadline):
+        pass
+    event.pop('type')
+    return event
+
+def iter_batch(printer_ips, username, password, full=False, profile=None, max_workers=PROXY_BATCH_WORKERS,
+               deadline=None):
+    """Configure many printers in parallel, yielding every printer's progress events tagged with its IP.
+
+    Each printer ends with a 'result' event; the last event has type 'summary' and counts the outcomes.
+    Every printer shares the batch's deadline.
+    """
+    deadline = deadline or Deadline(None)
+    started = time.monotonic()
+    events = queue.Queue()
+
+    def configure_one(printer_ip):
+        try:
+            # Jobs for the same printer never interleave, even across batches and single requests
+            with PRINTER_LOCKS.hold(printer_ip, deadline, 'a batch'):
+                for event in iter_configuration(printer_ip, username, password, full, profile, deadline):
+                    events.put(dict(event, printer_ip=printer_ip))
+        except Exception as e:
+            events.put({'type': 'result', 'printer_ip': printer_ip, 'success': False,
+                        'error': str(e), 'steps': []})
+
+    workers = max(1, min(max_workers, len(printer_ips)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch')
+    futures = [executor.submit(configure_one, printer_ip) for printer_ip in printer_ips]
+    succeeded = finished = 0
+    try:
+        while finished < len(printer_ips):
+            event = events.get()
+            if event['type'] == 'result':
+                finished += 1
+                succeeded += 1 if event['success'] else 0
+            yield event
+    finally:
+        # If the client went away, printers that have not started yet are skipped
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    yield {
+        'type': 'summary',
+        'success': succeeded == len(printer_ips),
+        'total': len(printer_ips),
+        'succeeded': succeeded,
+        'failed': len(printer_ips) - succeeded,
+        'workers': workers,
+        'elapsed': round(time.monotonic() - started, 3)
+    }
+
+def configure_batch(printer_ips, username, password, full=False, profile=None, max_workers=PROXY_BATCH_WORKERS,
+                    deadline=None):
+    """Configure many printers in parallel, returning per-printer results in request order."""
+    results = {}
+    for event in iter_batch(printer_ips, username, password, full, profile, max_workers, deadline):
+        if event['type'] == 'result':
+            results[event.pop('printer_ip')] = event
+            event.pop('type')
+    event.pop('type')
+    event['printers'] = [dict(results[printer_ip], printer_ip=printer_ip) for printer_ip in printer_ips]
+    return event
+
+def parse_batch_request(body, content_type):
+    """Read a batch request from a JSON or form body, returning de-duplicated IPs and the batch options."""
+    if content_type.startswith('application/json'):
+        payload = json.loads(body or '{}')
+        if not isinstance(payload, dict):
+            raise ValueError("Batch request must be a JSON object")
+    else:
+        payload = {k: v[0] for k, v in urllib.parse.parse_qs(body).items()}
+        # A form field names a profile, unless it holds an inline JSON definition
+        if payload.get('profile', '').lstrip().startswith('{'):
+            payload['profile'] = json.loads(payload['profile'])
+
+    printer_ips = payload.get('printer_ips', [])
+    if isinstance(printer_ips, str):
+        printer_ips = printer_ips.replace('\n', ',').split(',')
+    if not isinstance(printer_ips, list):
+        raise ValueError("printer_ips must be a list or a comma-separated string")
+    printer_ips = list(dict.fromkeys(str(ip).strip() for ip in printer_ips if str(ip).strip()))
+    if not printer_ips:
+        raise ValueError("At least one printer IP is required")
+    if len(printer_ips) > PROXY_BATCH_MAX_PRINTERS:
+        raise ValueError(f"Too many printers in one batch ({len(printer_ips)} > {PROXY_BATCH_MAX_PRINTERS})")
+    for printer_ip in printer_ips:
+        ipaddress.ip_address(printer_ip)
+    return printer_ips, {
+        'username': payload.get('username', 'admin'),
+        'password': payload.get('password', '1234'),
+        'full': parse_detail(payload.get('detail')),
+        'profile': resolve_profile(payload.get('profile')),
+        'max_workers': max(1, min(int(payload.get('max_workers', PROXY_BATCH_WORKERS)), PROXY_BATCH_WORKERS))
+    }
 
 class ProxyHandler(BaseHTTPRequestHandler):
+    def send_json(self, result, status=200):
+        """Send a JSON response, gzipped when the client accepts it."""
+        body, compressed = gzip_body(json.dumps(result).encode(), self.headers.get('Accept-Encoding', ''))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_GET(self):
         # Get printer IP from query parameters
         from urllib.parse import urlparse, parse_qs
+        if urlparse(self.path).path == '/metrics':
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
         query = parse_qs(urlparse(self.path).query)
+        if urlparse(self.path).path == '/inventory':
+            try:
+                params = {name: values[0] for name, values in query.items()}
+                self.send_json(query_inventory(params, get_profile().hash, profile_hashes()))
+            except ValueError as e:
+                self.send_json({'success': False, 'error': str(e)}, status=400)
+            return
+        if urlparse(self.path).path.rstrip('/') == '/api/fleet':
+            history = query.get('history', [''])[0].lower() in ('1', 'true', 'yes')
+            self.send_json(MONITOR.fleet(history))
+            return
+        if urlparse(self.path).path.startswith('/api/fleet/'):
+            status = MONITOR.status(urlparse(self.path).path.rsplit('/', 1)[-1], history=True)
+            if status is None:
+                self.send_json({'success': False, 'error': 'Printer is not monitored'}, status=404)
+            else:
+                self.send_json(status)
+            return
+        if urlparse(self.path).path == '/profiles':
+            self.send_json({'default': get_profile().name,
+                            'profiles': [profile.to_dict() for profile in PROFILES.values()]})
+            return
         printer_ip = query.get('printer_ip', [''])[0]
         
         if not printer_ip:
@@ -17,41 +565,97 @@ class ProxyHandler(BaseHTTPRequestHandler):
             return
             
         try:
-            # Try to connect to printer port 9100
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            port_result = sock.connect_ex((printer_ip, 9100)) == 0
-            sock.close()
-            
-            # Try HTTP connection
-            try:
-                response = urllib.request.urlopen(f'http://{printer_ip}', timeout=5)
-                http_result = response.getcode() == 200
-            except:
-                http_result = False
-                
+            refresh = query.get('refresh', [''])[0].lower() in ('1', 'true', 'yes')
+            ping = query.get('ping', [''])[0].lower() in ('1', 'true', 'yes')
+            ports = parse_ports(query.get('ports', [''])[0])
+
+            # Probe port 9100 (plus any extra ports) and HTTP concurrently, served from cache when fresh
+            result = BREAKER.note_probe(printer_ip, cached_probe(printer_ip, http_check, ports, refresh=refresh,
+                                                                 ping=ping))
+
             # Send results back
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            result = {
-                'port_9100': port_result,
-                'http': http_result,
-                'details': [
-                    f'Port 9100: {"Open" if port_result else "Closed"}',
-                    f'HTTP: {"Connected" if http_result else "Failed"}'
-                ]
-            }
-            
-            self.wfile.write(json.dumps(result).encode())
-            
+            self.send_json(result)
+
+        except ValueError as e:
+            self.send_error(400, str(e))
         except Exception as e:
             self.send_error(500, str(e))
 
+    def send_ndjson(self, events, description):
+        """Stream events as NDJSON lines, stopping quietly if the client disconnects."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        try:
+            for event in events:
+                self.wfile.write((json.dumps(event) + '\n').encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"Client disconnected while configuring {description}")
+        finally:
+            close = getattr(events, 'close', None)
+            if close:
+                close()
+
+    def handle_batch(self, stream):
+        """Configure every printer in a batch request in parallel, in one round trip from the browser."""
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length).decode()
+        try:
+            printer_ips, options = parse_batch_request(body, self.headers.get('Content-Type', ''))
+        except ValueError as e:
+            self.send_json({'success': False, 'error': str(e)}, status=400)
+            return
+
+        print(f"Batch configuration of {len(printer_ips)} printer(s), up to {options['max_workers']} at a time")
+        options['deadline'] = Deadline.from_header(self.headers.get(DEADLINE_HEADER))
+        if stream:
+            self.send_ndjson(iter_batch(printer_ips, **options), f"a batch of {len(printer_ips)} printers")
+        else:
+            self.send_json(configure_batch(printer_ips, **options))
+
+    def handle_monitor(self):
+        """Register printers with the background monitor from a JSON or form body."""
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length).decode()
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                payload = json.loads(body or '{}')
+            else:
+                payload = {k: v[0] for k, v in urllib.parse.parse_qs(body).items()}
+            printer_ips = parse_monitor_targets(payload.get('printer_ips', []))
+            if not printer_ips:
+                raise ValueError("At least one printer IP is required")
+            added = MONITOR.register(printer_ips)
+        except (ValueError, AttributeError) as e:
+            self.send_json({'success': False, 'error': str(e)}, status=400)
+            return
+        self.send_json({'success': True, 'added': added, 'monitored': MONITOR.fleet()['total']})
+
+    def do_DELETE(self):
+        path = urllib.parse.urlparse(self.path).path
+        if not path.startswith('/api/fleet/'):
+            self.send_error(404)
+            return
+        if MONITOR.unregister(path.rsplit('/', 1)[-1]):
+            self.send_json({'success': True})
+        else:
+            self.send_json({'success': False, 'error': 'Printer is not monitored'}, status=404)
+
     def do_POST(self):
+        # The caller's remaining budget covers waiting for the printer's lock as well as the work itself
+        deadline = Deadline.from_header(self.headers.get(DEADLINE_HEADER))
         try:
+            path = urllib.parse.urlparse(self.path).path.rstrip('/')
+            if path in ('/batch', '/batch/stream'):
+                self.handle_batch(stream=path.endswith('/stream'))
+                return
+            if path == '/api/fleet':
+                self.handle_monitor()
+                return
+
             # Get printer IP from header
             printer_ip = self.headers.get('X-Printer-IP')
             if not printer_ip:
@@ -66,144 +670,50 @@ class ProxyHandler(BaseHTTPRequestHandler):
             form_data = urllib.parse.parse_qs(post_data)
             username = form_data.get('username', ['admin'])[0]
             password = form_data.get('password', ['1234'])[0]
+            try:
+                full = parse_detail(form_data.get('detail', ['compact'])[0])
+                profile = resolve_profile(form_data.get('profile', [''])[0])
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
 
-            print(f"Attempting to configure printer at {printer_ip}")
-            
-            # Try different login combinations
-            print("Trying different login combinations...")
-            combinations = [
-                ({'1': password}, "password only"),
-                ({'0': username}, "username only"),
-                ({'0': username, '1': password}, "both username and password")
-            ]
-            
-            login_data = None
-            for creds, desc in combinations:
-                try:
-                    print(f"\nTrying {desc}")
-                    check_url = f'http://{printer_ip}/settings'
-                    check_data = urllib.parse.urlencode(creds).encode()
-                    
-                    check_request = urllib.request.Request(
-                        check_url,
-                        data=check_data,
-                        headers={'Content-Type': 'application/x-www-form-urlencoded'}
-                    )
-                    
-                    check_response = urllib.request.urlopen(check_request, timeout=10)
-                    response_data = check_response.read().decode()
-                    
-                    if "Incorrect" not in response_data:
-                        print(f"Success with {desc}")
-                        login_data = check_data
-                        break
-                        
-                except Exception as e:
-                    print(f"Failed with {desc}: {str(e)}")
-                    continue
-            
-            # If no combination worked, use both as fallback
-            if not login_data:
-                print("No login combination worked, using both as fallback")
-                login_data = urllib.parse.urlencode({'0': username, '1': password}).encode()
-
-            # Define configuration steps with debug logging
-            config_steps = [
-                {
-                    'name': 'Login',
-                    'url': f'http://{printer_ip}/settings',
-                    'data': login_data
-                },
-                {
-                    'name': 'Media Setup',
-                    'url': f'http://{printer_ip}/setmed',
-                    'data': urllib.parse.urlencode({'1': '0', '16': '0', '15': '0'}).encode()
-                },
-                {
-                    'name': 'General Setup',
-                    'url': f'http://{printer_ip}/setgen',
-                    'data': urllib.parse.urlencode({'1': '0', '12': '0'}).encode()
-                },
-                {
-                    'name': 'Save Settings',
-                    'url': f'http://{printer_ip}/settings',
-                    'data': urllib.parse.urlencode({'1': '1'}).encode()
-                }
-            ]
-
-            # Execute configuration steps
-            steps_results = []
-            session = urllib.request.build_opener()
-            session.addheaders = [('Content-Type', 'application/x-www-form-urlencoded')]
-
-            for step in config_steps:
-                try:
-                    print(f"\nExecuting {step['name']}")
-                    print(f"URL: {step['url']}")
-                    print(f"Data: {step['data'].decode()}")
-                    
-                    request = urllib.request.Request(
-                        step['url'],
-                        data=step['data'],
-                        headers={'Content-Type': 'application/x-www-form-urlencoded'}
-                    )
-                    
-                    response = session.open(request, timeout=10)
-                    response_data = response.read().decode()
-                    print(f"Response Code: {response.code}")
-                    print(f"Response: {response_data}")
-
-                    success = response.code == 200 and "Error" not in response_data
-                    steps_results.append({
-                        'step': step['name'],
-                        'status': 'success' if success else 'error',
-                        'response': response_data
-                    })
-
-                    if not success:
-                        print(f"Step failed with response: {response_data}")
-                        break
-
-                    # Add delay between steps
-                    time.sleep(2)
-
-                except Exception as e:
-                    error_msg = f"Error in {step['name']}: {str(e)}"
-                    print(error_msg)
-                    steps_results.append({
-                        'step': step['name'],
-                        'status': 'error',
-                        'error': str(e)
-                    })
-                    break
+            # Stream each step as NDJSON as it completes
+            if urllib.parse.urlparse(self.path).path.rstrip('/').endswith('/stream'):
+                # Jobs for the same printer never interleave; other printers run in parallel
+                with PRINTER_LOCKS.hold(printer_ip, deadline, 'a streamed configuration'):
+                    self.send_ndjson(iter_configuration(printer_ip, username, password, full, profile, deadline),
+                                     printer_ip)
+                return
+
+            # Identical requests already running for this printer share that run; different ones queue behind it
+            key = configuration_key('web', profile.hash, username, password, full)
+            result = PRINTER_LOCKS.run(printer_ip, key,
+                                       lambda: configure_printer(printer_ip, username, password, full, profile,
+                                                                 deadline),
+                                       deadline, 'a configuration request')
 
             # Send response back
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            result = {
-                'success': all(step['status'] == 'success' for step in steps_results),
-                'steps': steps_results
-            }
-            
-            self.wfile.write(json.dumps(result).encode())
-            
+            self.send_json(result)
+
+        except PrinterBusy as e:
+            self.send_json({'success': False, 'error': str(e), 'steps': []}, status=409)
+        except DeadlineExceeded as e:
+            self.send_json({'success': False, 'error': str(e), 'steps': []}, status=504)
         except Exception as e:
             self.send_error(500, str(e))
             
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Printer-IP')
         self.end_headers()
 
 if __name__ == '__main__':
     try:
-        server = HTTPServer(('localhost', 5001), ProxyHandler)
+        server = PooledHTTPServer(('localhost', 5001), ProxyHandler)
         print("\nProxy server is running on http://localhost:5001")
+        print(f"Handling up to {PROXY_MAX_WORKERS} requests concurrently")
         print("Use this URL in your render.com application")
         print("Press Ctrl+C to stop the server\n")
         server.serve_forever()
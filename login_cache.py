@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+LOGIN_CACHE_PATH = os.environ.get('ZEBRA_LOGIN_CACHE', os.path.expanduser('~/.zebra_login_cache.json'))
+LOGIN_CACHE_TTL = float(os.environ.get('ZEBRA_LOGIN_CACHE_TTL', 7 * 24 * 3600))
+
+class LoginCache:
+    """Persistent per-printer record of which login combination the printer accepted.
+
+    Only the name of the combination is stored, never the credentials themselves.
+    """
+
+    def __init__(self, path: str = LOGIN_CACHE_PATH, ttl: float = LOGIN_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write login cache {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached combination for a printer, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if time.time() - entry.get('updated', 0) > self.ttl:
+                del self._entries[key]
+                self._save()
+                return None
+            return entry.get('combination')
+
+    def set(self, key: str, combination: str):
+        """Remember the combination that worked for a printer."""
+        with self._lock:
+            self._entries[key] = {'combination': combination, 'updated': time.time()}
+            self._save()
+
+    def invalidate(self, key: str):
+        """Forget a printer's combination after it stopped working."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+def order_combinations(combinations: List[Tuple[dict, str]], preferred: Optional[str]) -> List[Tuple[dict, str]]:
+    """Move the preferred combination to the front so it is tried first."""
+    if not preferred:
+        return list(combinations)
+    return sorted(combinations, key=lambda combination: combination[1] != preferred)
+
+# Shared by every printer handled in this process
+LOGIN_CACHE = LoginCache()
@@ -0,0 +1,181 @@
+"""Minimal Prometheus-style metrics shared by the Flask app and the local proxy.
+
+Recording a sample is a dict lookup and an addition under a per-metric lock, so the
+instrumentation is cheap enough to leave on in production.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: Dict[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in (extra or {}).items()]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    """Base class holding one value per label combination."""
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down, or be computed at scrape time."""
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self):
+        if self._function is not None:
+            self.set(self._function())
+        yield from super().render()
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets."""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, {'le': _format_value(bound)})
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Metrics recorded by both servers
+PRINTER_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'zebra_printer_request_seconds', 'Latency of HTTP requests to printers by endpoint.', ('endpoint', 'method')))
+PRINTER_REQUEST_TIMEOUTS = REGISTRY.register(Counter(
+    'zebra_printer_request_timeouts_total', 'Printer requests that timed out.', ('endpoint',)))
+PRINTER_REQUEST_FAILURES = REGISTRY.register(Counter(
+    'zebra_printer_request_failures_total', 'Printer requests that failed (errors and timeouts).', ('endpoint',)))
+LOGIN_ATTEMPTS = REGISTRY.register(Counter(
+    'zebra_login_attempts_total', 'Login attempts by credential combination and result.', ('combination', 'result')))
+STEP_SECONDS = REGISTRY.register(Histogram(
+    'zebra_configuration_step_seconds', 'Duration of configuration steps.', ('step', 'status')))
+CONFIGURATIONS = REGISTRY.register(Counter(
+    'zebra_configurations_total', 'Completed configuration runs by result.', ('result',)))
+CONFIGURATIONS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'zebra_configurations_in_flight', 'Configuration runs currently in progress.'))
+
+def instrument_configuration(events):
+    """Wrap a configuration event stream, recording step durations, run outcomes and in-flight runs."""
+    with CONFIGURATIONS_IN_FLIGHT.track_inprogress():
+        for event in events:
+            if event.get('type') == 'step' and 'elapsed' in event:
+                STEP_SECONDS.observe(event['elapsed'], step=event.get('step', ''), status=event.get('status', ''))
+            elif event.get('type') == 'result':
+                CONFIGURATIONS.inc(result='success' if event.get('success') else 'failure')
+            yield event
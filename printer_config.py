@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlencode
+
+# Optional JSON file of named profiles, read once at startup, adding to or replacing the built-in ones
+PROFILES_PATH = os.environ.get('ZEBRA_PROFILES', '')
+DEFAULT_PROFILE_NAME = os.environ.get('ZEBRA_DEFAULT_PROFILE', 'default')
+
+# Web UI form each profile section is posted to, and the save that makes the changes permanent
+SECTIONS = ('media', 'general')
+SECTION_ENDPOINTS = {'media': '/setmed', 'general': '/setgen'}
+SAVE_ENDPOINT = '/settings'
+SAVE_FORM = urlencode({"1": "1"}).encode()  # Save flag
+
+# ZPL equivalents of the web form fields ZebraPrinter posts to /setmed and /setgen
+ZPL_MEDIA_TRACKING = {"0": "^MNY", "1": "^MNM", "2": "^MNA"}  # web (gap/notch), mark, auto-detect
+ZPL_PRINT_MODE = {"0": "^MMT", "1": "^MMP", "2": "^MMR", "3": "^MMA", "4": "^MMC"}  # tear off, peel, rewind, applicator, cutter
+ZPL_PRINT_METHOD = {"0": "^MTD", "1": "^MTT"}  # direct thermal, thermal transfer
+ZPL_SAVE = "^JUS"
+
+def media_zpl(fields: Dict[str, str]) -> List[str]:
+    """ZPL commands equivalent to media setup fields."""
+    if fields.get("1") == "1":
+        commands = ["^MNN"]  # continuous media has no tracking
+    else:
+        commands = [ZPL_MEDIA_TRACKING.get(fields.get("15", "0"), "^MNY")]
+    if "16" in fields:
+        commands.append(ZPL_PRINT_MODE.get(fields["16"], "^MMT"))
+    return commands
+
+def general_zpl(fields: Dict[str, str]) -> List[str]:
+    """ZPL commands equivalent to general setup fields."""
+    commands = []
+    if "1" in fields:
+        commands.append(ZPL_PRINT_METHOD.get(fields["1"], "^MTD"))
+    width = fields.get("12", "")
+    if width.isdigit():  # the same value the web form posts, so both transports leave the printer alike
+        commands.append(f"^PW{int(width)}")
+    return commands
+
+def profile_hash(profile: Dict[str, Dict[str, str]]) -> str:
+    """Stable short hash of a configuration profile (section -> field number -> value)."""
+    canonical = json.dumps({section: {str(k): str(v) for k, v in fields.items()}
+                            for section, fields in profile.items()}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+def zpl_stream(commands: List[str]) -> bytes:
+    return ("^XA" + "".join(commands) + "^XZ\r\n").encode("ascii")
+
+@dataclass(frozen=True)
+class ConfigProfile:
+    """A named, versioned set of media and general setup form fields (field number -> value)."""
+    name: str
+    version: int
+    media: Dict[str, str]
+    general: Dict[str, str]
+    description: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict, name: str = None, base: 'ConfigProfile' = None) -> 'ConfigProfile':
+        """Validate a profile definition; sections it leaves out are taken from `base`."""
+        if not isinstance(data, dict):
+            raise ValueError("Profile must be an object")
+        unknown = set(data) - set(SECTIONS) - {'name', 'version', 'description'}
+        if unknown:
+            raise ValueError(f"Unknown profile keys: {', '.join(sorted(unknown))} "
+                             f"(sections are {', '.join(SECTIONS)})")
+        sections = {}
+        for section in SECTIONS:
+            fields = data.get(section, getattr(base, section, None))
+            if not isinstance(fields, dict):
+                raise ValueError(f"Profile section '{section}' must map field numbers to values")
+            sections[section] = {str(number): str(value) for number, value in fields.items()}
+        if not sections['general'].get('12', '0').isdigit():
+            raise ValueError("Print width (general field 12) must be a whole number of dots")
+        try:
+            version = int(data.get('version', 1))
+        except (TypeError, ValueError):
+            raise ValueError("Profile version must be an integer")
+        return cls(str(data.get('name') or name or 'custom'), version, sections['media'], sections['general'],
+                   str(data.get('description', '')))
+
+    def compile(self) -> 'CompiledProfile':
+        return CompiledProfile(self)
+
+class CompiledProfile:
+    """A profile encoded once into the exact bytes each transport sends, with its content hash.
+
+    Applying it to any number of printers sends these bytes as they are; a diff that pushes only some
+    fields joins their pre-encoded pieces.
+    """
+
+    def __init__(self, profile: ConfigProfile):
+        self.profile = profile
+        self.name = profile.name
+        self.version = profile.version
+        self.media = profile.media
+        self.general = profile.general
+        # The hash covers the fields only, so it matches what is recorded in the inventory whatever the name
+        self.hash = profile_hash({'media': profile.media, 'general': profile.general})
+        self.form_fields = {
+            section: {number: urlencode({number: value}).encode() for number, value in self.fields(section).items()}
+            for section in SECTIONS
+        }
+        self.forms = {section: b'&'.join(pieces.values()) for section, pieces in self.form_fields.items()}
+        media_commands, general_commands = media_zpl(profile.media), general_zpl(profile.general)
+        self.zpl = {
+            'media': zpl_stream(media_commands),
+            'general': zpl_stream(general_commands),
+            'save': zpl_stream([ZPL_SAVE]),
+            'all': zpl_stream(media_commands + general_commands + [ZPL_SAVE])
+        }
+
+    def fields(self, section: str) -> Dict[str, str]:
+        return getattr(self.profile, section)
+
+    def form(self, section: str, fields: Optional[Dict[str, str]] = None) -> bytes:
+        """The encoded form body for a section: the whole profile, or only `fields` of it."""
+        if fields is None:
+            return self.forms[section]
+        pieces = self.form_fields[section]
+        return b'&'.join(pieces[number] if fields[number] == self.fields(section).get(number)
+                         else urlencode({number: fields[number]}).encode() for number in fields)
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'version': self.version, 'description': self.profile.description,
+                'hash': self.hash, 'media': self.media, 'general': self.general}
+
+# The full web form values PrinterConfig carried before profiles; kept so they can still be applied by name.
+# Most of these fields have no ZPL equivalent, so the raw transport only applies the media type
+WEB_FORM_DEFAULTS = ConfigProfile('web-form-defaults', 1, media={
+    "0": "1", "1": "1", "2": "1", "3": "0", "4": "832", "5": "3048"
+}, general={
+    "2": "0", "4": "26.0", "6": "4", "5": "0", "7": "2", "8": "0"
+}, description='Media and general form values of the original PrinterConfig defaults')
+
+# Fields posted by the Media Setup and General Setup steps unless another profile is chosen
+BUILTIN_PROFILES = [
+    ConfigProfile('default', 1, media={
+        "1": "0",   # Media type (0 = non-continuous, 1 = continuous)
+        "16": "0",  # Print mode
+        "15": "0"   # Media tracking
+    }, general={
+        "1": "0",   # Print method
+        "12": "0"   # Print width in dots
+    }, description='Non-continuous media, tear off, direct thermal'),
+    WEB_FORM_DEFAULTS
+]
+
+@dataclass
+class PrinterConfig:
+    """Configuration settings for the Zebra printer, as form field maps.
+
+    Kept for callers that build one directly; the defaults are the 'web-form-defaults' profile.
+    """
+    media_setup: Dict[str, str] = None
+    general_setup: Dict[str, str] = None
+    settings_setup: Dict[str, str] = None
+    feed_request: Dict[str, str] = None
+    test_print: Dict[str, str] = None
+
+    def __post_init__(self):
+        self.media_setup = self.media_setup or dict(WEB_FORM_DEFAULTS.media, submit="Submit Changes")
+        self.general_setup = self.general_setup or dict(WEB_FORM_DEFAULTS.general, submit="Submit Changes")
+        self.settings_setup = self.settings_setup or {"0": "Save Current Configuration"}
+        self.feed_request = self.feed_request or {"1": "submit"}
+        self.test_print = self.test_print or {"4": "submit"}
+
+def load_profiles(path: str = PROFILES_PATH) -> Dict[str, CompiledProfile]:
+    """Compile the built-in profiles plus those in a JSON file: a list of profiles or {"profiles": [...]}."""
+    profiles = {profile.name: profile for profile in BUILTIN_PROFILES}
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = data.get('profiles', []) if isinstance(data, dict) else data
+            for entry in entries:
+                base = profiles.get(entry.get('name')) or profiles['default']
+                profile = ConfigProfile.from_dict(entry, base=base)
+                profiles[profile.name] = profile
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Could not load profiles from {path}: {e}")
+    return {name: profile.compile() for name, profile in profiles.items()}
+
+PROFILES = load_profiles()
+
+def get_profile(name: Optional[str] = None) -> CompiledProfile:
+    """A loaded profile by name, or the default one."""
+    name = name or DEFAULT_PROFILE_NAME
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile: {name} (available: {', '.join(sorted(PROFILES))})")
+    return PROFILES[name]
+
+def resolve_profile(value: Union[None, str, Dict]) -> CompiledProfile:
+    """A request's profile: a loaded profile's name, an inline definition (compiled here), or the default."""
+    if not value:
+        return get_profile()
+    if isinstance(value, str):
+        return get_profile(value.strip())
+    return ConfigProfile.from_dict(value, name='custom', base=get_profile().profile).compile()
+
+def profile_hashes() -> Dict[str, str]:
+    """Name -> content hash of every loaded profile, so queries can name a profile instead of its hash."""
+    return {name: profile.hash for name, profile in PROFILES.items()}
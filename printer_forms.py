@@ -0,0 +1,70 @@
+from html.parser import HTMLParser
+from typing import Dict
+
+class FormFieldParser(HTMLParser):
+    """Collect the current value of every named field in a printer web UI form."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.fields: Dict[str, str] = {}
+        self._select = None
+        self._select_first = None
+        self._option_value = None
+        self._option_selected = False
+        self._option_text = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get('name')
+        if tag == 'input' and name:
+            kind = (attrs.get('type') or 'text').lower()
+            if kind in ('submit', 'button', 'reset', 'image'):
+                return
+            if kind in ('radio', 'checkbox'):
+                if 'checked' in attrs:
+                    self.fields[name] = attrs.get('value', 'on')
+                return
+            self.fields[name] = attrs.get('value', '')
+        elif tag == 'select' and name:
+            self._select = name
+            self._select_first = None
+        elif tag == 'option' and self._select:
+            self._option_value = attrs.get('value')
+            self._option_selected = 'selected' in attrs
+            self._option_text = ''
+            if self._option_value is not None:
+                self._record_option()
+
+    def handle_data(self, data):
+        if self._option_text is not None:
+            self._option_text += data
+
+    def handle_endtag(self, tag):
+        if tag == 'option' and self._select and self._option_text is not None:
+            if self._option_value is None:
+                # Options without a value attribute submit their text
+                self._option_value = self._option_text.strip()
+                self._record_option()
+            self._option_text = None
+        elif tag == 'select' and self._select:
+            if self._select not in self.fields and self._select_first is not None:
+                self.fields[self._select] = self._select_first
+            self._select = None
+
+    def _record_option(self):
+        if self._select_first is None:
+            self._select_first = self._option_value
+        if self._option_selected:
+            self.fields[self._select] = self._option_value
+
+def parse_form_fields(html: str) -> Dict[str, str]:
+    """Parse a settings page into a field-number -> value map, like the PrinterConfig dicts."""
+    parser = FormFieldParser()
+    parser.feed(html or '')
+    parser.close()
+    return parser.fields
+
+def diff_fields(current: Dict[str, str], target: Dict[str, str]) -> Dict[str, str]:
+    """Return the target fields whose value differs from (or is missing in) the current settings."""
+    return {name: value for name, value in target.items()
+            if name != 'submit' and str(current.get(name)) != str(value)}
@@ -0,0 +1,122 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from deadlines import Deadline, DeadlineExceeded
+from metrics import REGISTRY, Counter
+
+# How long a conflicting configuration queues for a busy printer before it is turned away
+PRINTER_LOCK_WAIT = float(os.environ.get('PRINTER_LOCK_WAIT', 30.0))
+
+CONFIGURATIONS_COALESCED = REGISTRY.register(Counter(
+    'zebra_configurations_coalesced_total',
+    'Configuration requests answered by an identical run that was already in flight.'))
+PRINTER_BUSY = REGISTRY.register(Counter(
+    'zebra_printer_busy_total', 'Configuration requests turned away because another run kept the printer.'))
+
+class PrinterBusy(Exception):
+    """Raised when another configuration run holds a printer longer than a request is willing to wait."""
+
+def configuration_key(*parts) -> str:
+    """Identify a configuration request (profile, transport, credentials...) without keeping its values."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+class _Flight:
+    """One execution in progress that identical requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class PrinterLocks:
+    """One lock per printer, with identical concurrent requests sharing a single run.
+
+    Requests for the same printer and key share one execution and its result. Any other request for
+    a busy printer queues for up to `wait` seconds (or its deadline), then fails with PrinterBusy.
+    """
+
+    def __init__(self, wait: float = PRINTER_LOCK_WAIT):
+        self.wait = wait
+        self._locks: Dict[str, threading.Lock] = {}
+        self._holders: Dict[str, str] = {}
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, ip: str) -> threading.Lock:
+        with self._guard:
+            if ip not in self._locks:
+                self._locks[ip] = threading.Lock()
+            return self._locks[ip]
+
+    def acquire(self, ip: str, deadline: Optional[Deadline] = None, owner: str = 'another configuration'):
+        """Take a printer's lock, queueing behind the current holder for up to `wait` seconds or the deadline."""
+        lock = self._lock(ip)
+        remaining = deadline.remaining() if deadline else float('inf')
+        timeout = min(self.wait, remaining, threading.TIMEOUT_MAX)
+        started = time.monotonic()
+        if not lock.acquire(timeout=timeout):
+            if deadline and deadline.expired:
+                raise DeadlineExceeded(f"Deadline exceeded waiting for another job on {ip} to finish")
+            PRINTER_BUSY.inc()
+            with self._guard:
+                holder = self._holders.get(ip, 'another configuration')
+            raise PrinterBusy(f"Printer {ip} is busy with {holder}; "
+                              f"gave up after waiting {time.monotonic() - started:.1f}s")
+        with self._guard:
+            self._holders[ip] = owner
+
+    def release(self, ip: str):
+        with self._guard:
+            self._holders.pop(ip, None)
+            lock = self._locks[ip]
+        lock.release()
+
+    @contextmanager
+    def hold(self, ip: str, deadline: Optional[Deadline] = None, owner: str = 'another configuration'):
+        """Hold a printer's lock for the duration of a block."""
+        self.acquire(ip, deadline, owner)
+        try:
+            yield
+        finally:
+            self.release(ip)
+
+    def run(self, ip: str, key: str, operation: Callable, deadline: Optional[Deadline] = None,
+            owner: str = 'another configuration'):
+        """Run `operation` holding the printer's lock, unless an identical run is in flight: then share its result."""
+        with self._guard:
+            flight = self._flights.get((ip, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(ip, key)] = _Flight()
+
+        if not leader:
+            remaining = deadline.remaining() if deadline else float('inf')
+            if not flight.done.wait(None if remaining == float('inf') else remaining):
+                raise DeadlineExceeded(f"Deadline exceeded waiting for the configuration of {ip} in progress")
+            CONFIGURATIONS_COALESCED.inc()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            with self.hold(ip, deadline, owner):
+                result = operation()
+            # Waiting requests get their own copy, so the caller may change its result freely
+            flight.result = copy.deepcopy(result)
+            return result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._guard:
+                del self._flights[(ip, key)]
+            flight.done.set()
+
+# Shared by every request handled in this process
+PRINTER_LOCKS = PrinterLocks()
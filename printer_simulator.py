@@ -0,0 +1,296 @@
+"""Local simulator of the Zebra printer web UI and raw 9100 port, for benchmarking without hardware.
+
+Run ``python printer_simulator.py --count 10`` to start ten simulated printers on 127.0.1.1-127.0.1.10.
+"""
+import argparse
+import random
+import re
+import socket
+import socketserver
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+CREDENTIAL_SCHEMES = ('password', 'username', 'both')
+
+@dataclass
+class SimulatorSettings:
+    """Behaviour of one simulated printer."""
+    model: str = 'ZT410-203dpi ZPL'
+    username: str = 'admin'
+    password: str = '1234'
+    credential_scheme: str = 'password'  # which login combination the printer accepts
+    latency: float = 0.02                # base response delay in seconds
+    jitter: float = 0.01                 # +/- uniform random delay in seconds
+    error_rate: float = 0.0              # probability of answering 500 instead of handling a request
+    save_delay: float = 0.2              # extra delay for the NVRAM save
+    chunked: bool = False                # send response bodies with chunked transfer encoding
+    idle_timeout: Optional[float] = None # close kept-alive connections idle this long, as printers do
+    media: Dict[str, str] = field(default_factory=lambda: {"1": "1", "15": "1", "16": "2"})
+    general: Dict[str, str] = field(default_factory=lambda: {"1": "1", "12": "0"})
+
+class SimulatedPrinter:
+    """State and request counters for one simulated printer."""
+
+    def __init__(self, ip: str, http_port: int, raw_port: int, settings: SimulatorSettings = None):
+        self.ip = ip
+        self.http_port = http_port
+        self.raw_port = raw_port
+        self.settings = settings or SimulatorSettings()
+        self.media = dict(self.settings.media)
+        self.general = dict(self.settings.general)
+        self.saved = {'media': dict(self.media), 'general': dict(self.general)}
+        self.sessions = set()
+        self.counters = Counter()
+        self.raw_payloads: List[bytes] = []
+        self.forms: List[Tuple[str, Dict[str, str]]] = []  # (path, fields) of every /setmed and /setgen post
+        self.lock = threading.Lock()
+        self._http_server = None
+        self._raw_server = None
+
+    def delay(self, extra: float = 0.0):
+        jitter = random.uniform(-self.settings.jitter, self.settings.jitter)
+        time.sleep(max(0.0, self.settings.latency + jitter + extra))
+
+    def fails(self) -> bool:
+        return random.random() < self.settings.error_rate
+
+    def check_login(self, fields: Dict[str, str]) -> bool:
+        scheme = self.settings.credential_scheme
+        username_ok = fields.get('0') == self.settings.username
+        password_ok = fields.get('1') == self.settings.password
+        if scheme == 'password':
+            return password_ok and '0' not in fields
+        if scheme == 'username':
+            return username_ok and '1' not in fields
+        return username_ok and password_ok
+
+    def apply_zpl(self, payload: bytes):
+        """Apply the subset of ZPL that ZebraPrinter's raw transport sends."""
+        text = payload.decode('ascii', errors='replace')
+        with self.lock:
+            self.raw_payloads.append(payload)
+            for command, value in re.findall(r'\^(MN|MM|MT|PW)(\w+)', text):
+                if command == 'MN':
+                    self.media['1'] = '1' if value == 'N' else '0'
+                    self.media['15'] = {'Y': '0', 'M': '1', 'A': '2'}.get(value, self.media.get('15', '0'))
+                elif command == 'MM':
+                    self.media['16'] = {'T': '0', 'P': '1', 'R': '2', 'A': '3', 'C': '4'}.get(value, '0')
+                elif command == 'MT':
+                    self.general['1'] = '1' if value == 'T' else '0'
+                elif command == 'PW':
+                    self.general['12'] = value
+            if '^JUS' in text:
+                self.counters['saves'] += 1
+                self.saved = {'media': dict(self.media), 'general': dict(self.general)}
+
+    def start(self):
+        printer = self
+
+        class Handler(SimulatorHandler):
+            simulated = printer
+            timeout = printer.settings.idle_timeout
+
+        self._http_server = ThreadingHTTPServer((self.ip, self.http_port), Handler)
+        self._http_server.daemon_threads = True
+        self.http_port = self._http_server.server_address[1]
+        threading.Thread(target=self._http_server.serve_forever, daemon=True).start()
+
+        class RawHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                chunks = []
+                while True:
+                    data = self.request.recv(65536)
+                    if not data:
+                        break
+                    chunks.append(data)
+                printer.counters['raw_connections'] += 1
+                # Connections that send nothing are reachability pre-checks, not print jobs
+                if chunks:
+                    printer.apply_zpl(b''.join(chunks))
+
+        self._raw_server = socketserver.ThreadingTCPServer((self.ip, self.raw_port), RawHandler)
+        self._raw_server.daemon_threads = True
+        self.raw_port = self._raw_server.server_address[1]
+        threading.Thread(target=self._raw_server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in (self._http_server, self._raw_server):
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+def render_form(title: str, fields: Dict[str, str]) -> str:
+    """Render a settings page in the shape of the printer web UI forms."""
+    inputs = ''.join(f'<tr><td>Field {name}</td><td><input type="text" name="{name}" value="{value}"></td></tr>'
+                     for name, value in sorted(fields.items()))
+    return (f'<html><head><title>{title}</title></head><body><form method="post">'
+            f'<table>{inputs}</table><input type="submit" name="submit" value="Submit Changes"></form></body></html>')
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    """Emulates the endpoints ZebraPrinter and the local proxy use."""
+    protocol_version = 'HTTP/1.1'
+    simulated: SimulatedPrinter = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.simulated.counters['connections'] += 1
+
+    def _session(self) -> Optional[str]:
+        match = re.search(r'SESSION=(\w+)', self.headers.get('Cookie', ''))
+        return match.group(1) if match else None
+
+    def _logged_in(self) -> bool:
+        return self._session() in self.simulated.sessions
+
+    def _reply(self, status: int, body: str, cookie: str = None):
+        data = body.encode()
+        chunked = self.simulated.settings.chunked and self.command != 'HEAD'
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(len(data)))
+        self.send_header('Server', f'Zebra {self.simulated.settings.model}')
+        if cookie:
+            self.send_header('Set-Cookie', f'SESSION={cookie}; Path=/')
+        self.end_headers()
+        if chunked:
+            for start in range(0, len(data), 64):
+                piece = data[start:start + 64]
+                self.wfile.write(f'{len(piece):x}\r\n'.encode() + piece + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        elif self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _page(self, text: str) -> str:
+        return f'<html><head><title>{self.simulated.settings.model}</title></head><body>{text}</body></html>'
+
+    def do_HEAD(self):
+        self.simulated.counters['HEAD ' + self.path] += 1
+        self._reply(200, '')
+
+    def do_GET(self):
+        printer = self.simulated
+        printer.counters['GET ' + self.path] += 1
+        printer.delay()
+        if printer.fails():
+            self._reply(500, self._page('Error: simulated failure'))
+            return
+        with printer.lock:
+            if self.path == '/setmed':
+                body = render_form(printer.settings.model, printer.media)
+            elif self.path == '/setgen':
+                body = render_form(printer.settings.model, printer.general)
+            elif self.path == '/':
+                body = self._page('Zebra Technologies printer home page')
+            else:
+                self._reply(404, self._page('Not Found'))
+                return
+        self._reply(200, body)
+
+    def do_POST(self):
+        printer = self.simulated
+        length = int(self.headers.get('Content-Length', 0))
+        fields = {k: v[0] for k, v in urllib.parse.parse_qs(self.rfile.read(length).decode()).items()}
+        printer.counters['POST ' + self.path] += 1
+        printer.delay()
+        if printer.fails():
+            self._reply(500, self._page('Error: simulated failure'))
+            return
+
+        if self.path == '/settings':
+            if fields == {'1': '1'} and self._logged_in():
+                printer.delay(printer.settings.save_delay)
+                with printer.lock:
+                    printer.counters['saves'] += 1
+                    printer.saved = {'media': dict(printer.media), 'general': dict(printer.general)}
+                self._reply(200, self._page('Configuration saved'))
+                return
+            printer.counters['logins'] += 1
+            if printer.check_login(fields):
+                session = uuid.uuid4().hex
+                with printer.lock:
+                    printer.sessions.add(session)
+                self._reply(200, self._page('Settings'), cookie=session)
+            else:
+                self._reply(200, self._page('Incorrect user name or password'))
+            return
+
+        if self.path in ('/setmed', '/setgen'):
+            if not self._logged_in():
+                self._reply(403, self._page('Error: not logged in'))
+                return
+            with printer.lock:
+                printer.forms.append((self.path, fields))
+                target = printer.media if self.path == '/setmed' else printer.general
+                target.update({k: v for k, v in fields.items() if k != 'submit'})
+            self._reply(200, self._page('Changes accepted'))
+            return
+
+        if self.path in ('/feed', '/test_print'):
+            self._reply(200, self._page('Request sent'))
+            return
+
+        self._reply(404, self._page('Not Found'))
+
+def loopback_ips(base_ip: str, count: int) -> List[str]:
+    """Consecutive addresses starting at base_ip (all of 127.0.0.0/8 is loopback on Linux and Windows)."""
+    first = int.from_bytes(socket.inet_aton(base_ip), 'big')
+    return [socket.inet_ntoa((first + i).to_bytes(4, 'big')) for i in range(count)]
+
+def start_fleet(count: int, base_ip: str = '127.0.1.1', http_port: int = 18080, raw_port: int = 19100,
+                settings: SimulatorSettings = None, schemes: bool = False) -> List[SimulatedPrinter]:
+    """Start `count` simulated printers on consecutive loopback addresses sharing the same ports.
+
+    With `schemes`, the credential scheme rotates through CREDENTIAL_SCHEMES across the fleet.
+    """
+    printers = []
+    for index, ip in enumerate(loopback_ips(base_ip, count)):
+        printer_settings = SimulatorSettings(**vars(settings)) if settings else SimulatorSettings()
+        if schemes:
+            printer_settings.credential_scheme = CREDENTIAL_SCHEMES[index % len(CREDENTIAL_SCHEMES)]
+        printers.append(SimulatedPrinter(ip, http_port, raw_port, printer_settings).start())
+    return printers
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate Zebra printers for local testing and benchmarks.')
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--base-ip', default='127.0.1.1')
+    parser.add_argument('--http-port', type=int, default=18080)
+    parser.add_argument('--raw-port', type=int, default=19100)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--scheme', choices=CREDENTIAL_SCHEMES + ('mixed',), default='password')
+    args = parser.parse_args()
+
+    settings = SimulatorSettings(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        credential_scheme='password' if args.scheme == 'mixed' else args.scheme
+    )
+    printers = start_fleet(args.count, args.base_ip, args.http_port, args.raw_port, settings,
+                           schemes=args.scheme == 'mixed')
+    for printer in printers:
+        print(f"Simulated {printer.settings.model} at http://{printer.ip}:{printer.http_port} "
+              f"(raw {printer.raw_port}, login: {printer.settings.credential_scheme})")
+    print("Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for printer in printers:
+            printer.stop()
+
+if __name__ == '__main__':
+    main()
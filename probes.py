@@ -0,0 +1,274 @@
+import asyncio
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from inventory import INVENTORY
+
+PROBE_DEADLINE = float(os.environ.get('PROBE_DEADLINE', 3.0))
+PROBE_CACHE_TTL = float(os.environ.get('PROBE_CACHE_TTL', 15.0))
+SNMP_PORT = 161
+# Echo request types for ICMP and ICMPv6
+ICMP_ECHO = {socket.AF_INET: (8, 0), socket.AF_INET6: (128, 129)}
+
+# SNMPv1 GetRequest for sysDescr.0 with community "public"
+SNMP_GET_SYSDESCR = bytes.fromhex(
+    '302902010004067075626c6963a01c0204000000010201000201003'
+    '00e300c06082b060102010101000500'
+)
+
+# Probes are short-lived blocking calls, so a shared thread pool runs them side by side
+PROBE_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get('PROBE_WORKERS', 32)), thread_name_prefix='probe')
+
+def check_tcp_port(ip: str, port: int, timeout: float) -> Dict:
+    """Try a TCP connect and report whether the port is open and how long the connect took.
+
+    A refused connection still proves the host answered, so it counts as reachable.
+    """
+    started = time.monotonic()
+    try:
+        with socket.create_connection((ip, port), timeout=timeout):
+            latency = time.monotonic() - started
+        return {'open': True, 'reachable': True, 'latency_ms': round(latency * 1000, 1),
+                'detail': f'Port {port}: open'}
+    except socket.timeout:
+        return {'open': False, 'reachable': False, 'latency_ms': None, 'detail': f'Port {port}: timed out'}
+    except OSError as e:
+        return {'open': False, 'reachable': isinstance(e, ConnectionRefusedError), 'latency_ms': None,
+                'detail': f'Port {port}: closed ({e.strerror or e})'}
+
+async def check_tcp_port_async(ip: str, port: int, timeout: float) -> Dict:
+    """check_tcp_port() for code running on an event loop."""
+    started = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        latency = time.monotonic() - started
+        writer.close()
+        return {'open': True, 'reachable': True, 'latency_ms': round(latency * 1000, 1),
+                'detail': f'Port {port}: open'}
+    except asyncio.TimeoutError:
+        return {'open': False, 'reachable': False, 'latency_ms': None, 'detail': f'Port {port}: timed out'}
+    except OSError as e:
+        return {'open': False, 'reachable': isinstance(e, ConnectionRefusedError), 'latency_ms': None,
+                'detail': f'Port {port}: closed ({e.strerror or e})'}
+
+def _icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def _icmp_socket(family: int) -> Optional[socket.socket]:
+    """An ICMP socket: unprivileged datagram sockets where the OS allows them, raw ones when running as admin."""
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            return socket.socket(family, kind, proto)
+        except OSError:
+            continue
+    return None
+
+def check_icmp(ip: str, timeout: float) -> Optional[Dict]:
+    """Send one ICMP echo request and time the reply, without running ping.
+
+    Returns None when this process may not open an ICMP socket, so callers can fall back to TCP.
+    """
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    sock = _icmp_socket(family)
+    if sock is None:
+        return None
+    request_type, reply_type = ICMP_ECHO[family]
+    ident, sequence = random.randrange(1 << 16), 1
+    payload = b'zebra-probe'
+    header = struct.pack('!BBHHH', request_type, 0, 0, ident, sequence)
+    # The kernel fills in ICMPv6 checksums itself
+    checksum = 0 if family == socket.AF_INET6 else _icmp_checksum(header + payload)
+    packet = struct.pack('!BBHHH', request_type, 0, checksum, ident, sequence) + payload
+
+    started = time.monotonic()
+    try:
+        with sock:
+            sock.connect((ip, 0))
+            sock.send(packet)
+            while True:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise socket.timeout
+                sock.settimeout(remaining)
+                reply = sock.recv(1024)
+                # Raw sockets (and some datagram ones) deliver the IPv4 header too
+                if family == socket.AF_INET and len(reply) >= 20 and reply[0] >> 4 == 4:
+                    reply = reply[(reply[0] & 0x0f) * 4:]
+                if len(reply) < 8:
+                    continue
+                kind, _, _, _, reply_sequence = struct.unpack('!BBHHH', reply[:8])
+                # Datagram sockets rewrite the identifier, so only the sequence number is compared
+                if kind == reply_type and reply_sequence == sequence and reply[8:] == payload:
+                    break
+        latency = round((time.monotonic() - started) * 1000, 1)
+        return {'reachable': True, 'latency_ms': latency, 'detail': f'Ping: reply in {latency} ms'}
+    except socket.timeout:
+        return {'reachable': False, 'latency_ms': None, 'detail': 'Ping: no reply'}
+    except OSError as e:
+        return {'reachable': False, 'latency_ms': None, 'detail': f'Ping: error ({e.strerror or e})'}
+
+def check_snmp(ip: str, timeout: float) -> Dict:
+    """Send an SNMP sysDescr request and report whether the agent answered."""
+    started = time.monotonic()
+    try:
+        with socket.socket(socket.AF_INET6 if ':' in ip else socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(timeout)
+            # Connecting the UDP socket lets an ICMP port-unreachable fail fast
+            sock.connect((ip, SNMP_PORT))
+            sock.send(SNMP_GET_SYSDESCR)
+            sock.recv(2048)
+        latency = time.monotonic() - started
+        return {'open': True, 'reachable': True, 'latency_ms': round(latency * 1000, 1),
+                'detail': f'SNMP ({SNMP_PORT}): responding'}
+    except socket.timeout:
+        return {'open': False, 'reachable': False, 'latency_ms': None, 'detail': f'SNMP ({SNMP_PORT}): no response'}
+    except OSError as e:
+        return {'open': False, 'reachable': False, 'latency_ms': None,
+                'detail': f'SNMP ({SNMP_PORT}): error ({e.strerror or e})'}
+
+def probe_printer(ip: str, http_check: Callable[[str, float], Tuple[bool, str]],
+                  ports: Iterable[int] = (9100,), deadline: float = PROBE_DEADLINE, ping: bool = False) -> Dict:
+    """Run the port and HTTP checks (and an ICMP ping if asked) concurrently under one overall deadline.
+
+    ``http_check(ip, timeout)`` returns ``(ok, detail)`` so each server can use its own HTTP client.
+    The host counts as reachable when it answered the ping or any TCP connect, even with a refusal.
+    """
+    started = time.monotonic()
+    checks = {}
+    if ping:
+        checks['ping'] = PROBE_POOL.submit(check_icmp, ip, deadline)
+    for port in dict.fromkeys(ports):
+        if port == SNMP_PORT:
+            checks[port] = PROBE_POOL.submit(check_snmp, ip, deadline)
+        else:
+            checks[port] = PROBE_POOL.submit(check_tcp_port, ip, port, deadline)
+    checks['http'] = PROBE_POOL.submit(http_check, ip, deadline)
+    wait(checks.values(), timeout=deadline)
+
+    results = {
+        'ip': ip,
+        'port_9100': False,
+        'http': False,
+        'reachable': False,
+        'ports': {},
+        'details': []
+    }
+    for name, future in checks.items():
+        if name == 'ping':
+            outcome = future.result() if future.done() else {'reachable': False, 'latency_ms': None,
+                                                              'detail': 'Ping: no reply'}
+            if outcome is None:
+                results['ping'] = {'method': 'tcp', 'reachable': False, 'latency_ms': None}
+                results['details'].append('Ping: ICMP is not permitted for this process; using TCP connects')
+            else:
+                results['ping'] = {'method': 'icmp', 'reachable': outcome['reachable'],
+                                   'latency_ms': outcome['latency_ms']}
+                results['details'].append(outcome['detail'])
+                results['reachable'] = results['reachable'] or outcome['reachable']
+            continue
+        if name == 'http':
+            if future.done():
+                try:
+                    ok, detail = future.result()
+                except Exception as e:
+                    ok, detail = False, f'HTTP connection failed: {str(e)}'
+            else:
+                future.cancel()
+                ok, detail = False, 'HTTP connection timed out'
+            results['http'] = ok
+            results['reachable'] = results['reachable'] or ok
+            results['details'].append(detail)
+            continue
+
+        if future.done():
+            outcome = future.result()
+        else:
+            future.cancel()
+            outcome = {'open': False, 'reachable': False, 'latency_ms': None, 'detail': f'Port {name}: timed out'}
+        results['ports'][str(name)] = {'open': outcome['open'], 'latency_ms': outcome['latency_ms']}
+        results['details'].append(outcome['detail'])
+        results['reachable'] = results['reachable'] or outcome['reachable']
+        if name == 9100:
+            results['port_9100'] = outcome['open']
+
+    if 'ping' in results and results['ping']['method'] == 'tcp':
+        # Without ICMP the fastest open port's connect time stands in for the round trip
+        latencies = [port['latency_ms'] for port in results['ports'].values() if port['latency_ms'] is not None]
+        results['ping'].update(reachable=results['reachable'], latency_ms=min(latencies) if latencies else None)
+    results['elapsed'] = round(time.monotonic() - started, 3)
+    return results
+
+class StatusCache:
+    """Short-lived, thread-safe cache of probe results keyed by printer IP."""
+
+    def __init__(self, ttl: float = PROBE_CACHE_TTL, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Tuple[float, Dict]]:
+        """Return ``(age, value)`` for a fresh entry, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[0]
+            if age > self.ttl:
+                del self._entries[key]
+                return None
+            return age, entry[1]
+
+    def put(self, key, value: Dict):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                for stale in [k for k, (stamp, _) in self._entries.items() if now - stamp > self.ttl]:
+                    del self._entries[stale]
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic(), value)
+
+STATUS_CACHE = StatusCache()
+
+def cached_probe(ip: str, http_check: Callable[[str, float], Tuple[bool, str]],
+                 ports: Iterable[int] = (9100,), refresh: bool = False, ping: bool = False,
+                 cache: StatusCache = STATUS_CACHE) -> Dict:
+    """Return a cached probe result for the printer, probing again if stale or ``refresh`` is set."""
+    ports = tuple(sorted(set(ports) | {9100}))
+    key = (ip, ports, ping)
+    hit = None if refresh else cache.get(key)
+    if hit is not None:
+        age, result = hit
+        return dict(result, cached=True, age=round(age, 3))
+
+    result = probe_printer(ip, http_check, ports, ping=ping)
+    result['checked_at'] = time.time()
+    cache.put(key, result)
+    INVENTORY.record_probe(ip, result)
+    return dict(result, cached=False, age=0.0)
+
+def parse_ports(value: Optional[str]) -> Tuple[int, ...]:
+    """Parse an optional comma-separated list of extra ports to probe (e.g. "443,161")."""
+    ports = [9100]
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part:
+            if not part.isdigit():
+                raise ValueError(f"Invalid port: {part}")
+            port = int(part)
+            if not 0 < port < 65536:
+                raise ValueError(f"Invalid port: {part}")
+            ports.append(port)
+    return tuple(ports)
@@ -0,0 +1,59 @@
+"""Compact step results and gzip-compressed JSON bodies, shared by the Flask app and the local proxy."""
+import gzip
+import hashlib
+import html
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Responses smaller than this are sent uncompressed; gzip would not pay for its own overhead
+GZIP_MIN_SIZE = int(os.environ.get('GZIP_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+
+DETAIL_LEVELS = ('compact', 'full')
+MESSAGE_MAX_LENGTH = 200
+
+_SCRIPT_STYLE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]+>')
+_ERROR = re.compile(r'[^.!?\n]*\b(?:Error|Incorrect|Invalid|Failed)\b[^.!?\n]*', re.IGNORECASE)
+
+def parse_detail(value: Optional[str]) -> bool:
+    """Whether a request's `detail` parameter asks for full printer responses."""
+    detail = (value or 'compact').strip().lower()
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"Invalid detail level: {value} (expected one of {', '.join(DETAIL_LEVELS)})")
+    return detail == 'full'
+
+def page_text(body: str) -> List[str]:
+    """Visible text fragments of an HTML page, one per run of text between tags."""
+    text = html.unescape(_TAG.sub('\n', _SCRIPT_STYLE.sub(' ', body or '')))
+    return [fragment for fragment in (' '.join(line.split()) for line in text.splitlines()) if fragment]
+
+def extract_error(body: str) -> Optional[str]:
+    """The sentence of a printer page that reports an error, if there is one."""
+    for fragment in page_text(body):
+        match = _ERROR.search(fragment)
+        if match:
+            return match.group(0).strip()[:MESSAGE_MAX_LENGTH]
+    return None
+
+def summarize_response(body: str, status: Optional[int] = None, full: bool = False) -> Dict:
+    """Describe a printer response by status, size, digest and any extracted error instead of the whole page."""
+    data = (body or '').encode('utf-8', errors='replace')
+    summary = {}
+    if status is not None:
+        summary['http_status'] = status
+    summary['bytes'] = len(data)
+    summary['digest'] = hashlib.sha256(data).hexdigest()[:16]
+    error = extract_error(body)
+    if error:
+        summary['message'] = error
+    if full:
+        summary['response'] = body
+    return summary
+
+def gzip_body(body: bytes, accept_encoding: str) -> Tuple[bytes, bool]:
+    """Gzip a response body if the client accepts it and it is large enough to benefit."""
+    if len(body) < GZIP_MIN_SIZE or 'gzip' not in (accept_encoding or '').lower():
+        return body, False
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), True
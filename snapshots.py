@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from async_printer import PRINTER_LOOP, AsyncZebraPrinter
+from deadlines import Deadline
+from printer_config import SECTIONS, CompiledProfile, ConfigProfile, profile_hash
+
+SNAPSHOT_ARCHIVE = os.environ.get('ZEBRA_SNAPSHOTS', os.path.expanduser('~/.zebra_snapshots.jsonl'))
+# Printers read at once; each is one socket on the shared event loop, not a thread
+SNAPSHOT_CONCURRENCY = int(os.environ.get('SNAPSHOT_CONCURRENCY', 64))
+
+def _field_order(number: str):
+    return (0, int(number), '') if number.isdigit() else (1, 0, number)
+
+def normalize_settings(settings: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    """Compact, canonical field maps: values trimmed, fields in numeric order, unknown sections dropped."""
+    return {section: {str(number): str(value).strip()
+                      for number, value in sorted(settings.get(section, {}).items(),
+                                                  key=lambda item: _field_order(str(item[0])))}
+            for section in SECTIONS}
+
+async def _read_printer(ip: str, username: str, password: str, http_port: int, deadline: Deadline,
+                        limit: asyncio.Semaphore) -> Tuple[Dict[str, Dict[str, str]], str]:
+    async with limit:
+        async with AsyncZebraPrinter(ip, username, password, http_port=http_port, deadline=deadline) as printer:
+            await printer.login()
+            return normalize_settings(await printer.read_current_settings()), printer.model
+
+async def read_fleet_settings(ips: Iterable[str], username: str = "admin", password: str = "1234",
+                              http_port: int = 80, deadline: Deadline = None,
+                              concurrency: int = SNAPSHOT_CONCURRENCY) -> Dict[str, Dict]:
+    """Log in to every printer and read its settings pages concurrently on one event loop.
+
+    Returns ip -> {'settings': ..., 'model': ...} or {'error': ...}.
+    """
+    ips = list(ips)
+    deadline = deadline or Deadline(None)
+    limit = asyncio.Semaphore(max(1, concurrency))
+    outcomes = await asyncio.gather(*(_read_printer(ip, username, password, http_port, deadline, limit)
+                                      for ip in ips), return_exceptions=True)
+    results = {}
+    for ip, outcome in zip(ips, outcomes):
+        if isinstance(outcome, BaseException):
+            results[ip] = {'error': str(outcome) or type(outcome).__name__}
+        else:
+            results[ip] = {'settings': outcome[0], 'model': outcome[1]}
+    return results
+
+class SnapshotArchive:
+    """Append-only JSON Lines archive of fleet snapshots.
+
+    Each distinct configuration is written once, keyed by its content hash; a snapshot record maps
+    printer IPs to those hashes. Nothing is ever rewritten, so an archive can be copied or tailed safely.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_ARCHIVE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._configs: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self._snapshots: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from an interrupted write
+                    if record.get('type') == 'config':
+                        self._configs[record['hash']] = record['fields']
+                    elif record.get('type') == 'snapshot':
+                        self._snapshots[record['id']] = record
+        except OSError:
+            pass
+
+    def _append(self, records: List[Dict]):
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add(self, readings: Dict[str, Dict], note: str = '') -> Dict:
+        """Store a snapshot from read_fleet_settings() results, writing only configurations not seen before."""
+        printers, errors, models, new_configs = {}, {}, {}, {}
+        for ip, reading in readings.items():
+            if 'error' in reading:
+                errors[ip] = reading['error']
+                continue
+            config_hash = profile_hash(reading['settings'])
+            printers[ip] = config_hash
+            models[ip] = reading.get('model', 'unknown')
+            if config_hash not in self._configs:
+                new_configs[config_hash] = reading['settings']
+
+        snapshot = {'type': 'snapshot', 'id': uuid.uuid4().hex[:12], 'taken_at': time.time(), 'note': note,
+                    'printers': printers, 'models': models, 'errors': errors}
+        with self._lock:
+            new_configs = {config_hash: fields for config_hash, fields in new_configs.items()
+                           if config_hash not in self._configs}
+            try:
+                self._append([{'type': 'config', 'hash': config_hash, 'fields': fields}
+                              for config_hash, fields in new_configs.items()] + [snapshot])
+            except OSError as e:
+                raise OSError(f"Could not write snapshot archive {self.path}: {e}")
+            self._configs.update(new_configs)
+            self._snapshots[snapshot['id']] = snapshot
+        return dict(self.summary(snapshot), new_configs=len(new_configs))
+
+    @staticmethod
+    def summary(snapshot: Dict) -> Dict:
+        return {
+            'id': snapshot['id'],
+            'taken_at': snapshot['taken_at'],
+            'note': snapshot.get('note', ''),
+            'printers': len(snapshot['printers']),
+            'unique_configs': len(set(snapshot['printers'].values())),
+            'errors': snapshot['errors']
+        }
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            snapshots = list(self._snapshots.values())
+        return [self.summary(snapshot) for snapshot in sorted(snapshots, key=lambda s: s['taken_at'], reverse=True)]
+
+    def get(self, snapshot_id: str) -> Optional[Dict]:
+        """A snapshot with its printers' config hashes and each distinct configuration once."""
+        with self._lock:
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is None:
+                return None
+            configs = {config_hash: self._configs[config_hash] for config_hash in set(snapshot['printers'].values())}
+        return dict(self.summary(snapshot), printers=snapshot['printers'], models=snapshot.get('models', {}),
+                    configs=configs)
+
+    def restore_plan(self, snapshot_id: str, ips: Optional[Iterable[str]] = None,
+                     config_hash: Optional[str] = None) -> Dict[str, CompiledProfile]:
+        """Compiled profile to push to each printer: its own config from the snapshot, or `config_hash` to all.
+
+        Each distinct configuration is compiled once however many printers share it.
+        """
+        snapshot = self.get(snapshot_id)
+        if snapshot is None:
+            raise KeyError(snapshot_id)
+        targets = list(ips) if ips else list(snapshot['printers'])
+        if config_hash is not None:
+            if config_hash not in snapshot['configs']:
+                raise ValueError(f"Configuration {config_hash} is not part of snapshot {snapshot_id}")
+            hashes = {ip: config_hash for ip in targets}
+        else:
+            missing = [ip for ip in targets if ip not in snapshot['printers']]
+            if missing:
+                raise ValueError(f"Not in snapshot {snapshot_id}: {', '.join(missing)} "
+                                 f"(pass config_hash to push one configuration to other printers)")
+            hashes = {ip: snapshot['printers'][ip] for ip in targets}
+
+        compiled = {}
+        for wanted in set(hashes.values()):
+            fields = snapshot['configs'][wanted]
+            compiled[wanted] = ConfigProfile(f"snapshot-{snapshot_id}-{wanted[:8]}", 1, fields['media'],
+                                             fields['general'], f"Restored from snapshot {snapshot_id}").compile()
+        return {ip: compiled[wanted] for ip, wanted in hashes.items()}
+
+def take_snapshot(ips: Iterable[str], username: str = "admin", password: str = "1234", http_port: int = 80,
+                  deadline: Deadline = None, note: str = '', archive: SnapshotArchive = None) -> Dict:
+    """Read every printer's settings concurrently and append the snapshot to the archive."""
+    archive = archive or SNAPSHOTS
+    started = time.monotonic()
+    readings = PRINTER_LOOP.run(read_fleet_settings(ips, username, password, http_port, deadline))
+    return dict(archive.add(readings, note), elapsed=round(time.monotonic() - started, 3))
+
+# Shared by every request handled in this process
+SNAPSHOTS = SnapshotArchive()
@@ -0,0 +1,117 @@
+"""Prebuilt, precompressed static assets for the web UI, with validators for conditional requests."""
+import gzip
+import hashlib
+import re
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_PREFIX = '/assets/'
+
+_STYLE = re.compile(r'[ \t]*<style>(.*?)</style>\n?', re.DOTALL)
+_SCRIPT = re.compile(r'[ \t]*<script>(.*?)</script>\n?', re.DOTALL)
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each encoding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+class StaticAsset:
+    """One asset held in memory as identity, gzip and (when available) brotli bytes."""
+
+    def __init__(self, name: str, content: bytes, mimetype: str, immutable: bool, built: float = None):
+        self.name = name
+        self.mimetype = mimetype
+        self.immutable = immutable
+        self.digest = hashlib.sha256(content).hexdigest()[:16]
+        self.built = int(built if built is not None else time.time())
+        self.last_modified = formatdate(self.built, usegmt=True)
+        self.variants = {'identity': content, 'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(content, quality=11)
+        # Drop encodings that would not make the asset smaller
+        self.variants = {encoding: body for encoding, body in self.variants.items()
+                         if encoding == 'identity' or len(body) < len(content)}
+
+    @property
+    def cache_control(self) -> str:
+        # Fingerprinted assets never change under the same URL; the page itself is always revalidated
+        if self.immutable:
+            return f'public, max-age={ASSET_MAX_AGE}, immutable'
+        return 'no-cache'
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == 'identity' else f'"{self.digest}-{encoding}"'
+
+    def select(self, accept_encoding: str) -> Tuple[str, bytes]:
+        """Pick the smallest variant the client accepts."""
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        candidates = [(len(body), encoding) for encoding, body in self.variants.items()
+                      if encoding == 'identity' or accepted.get(encoding, wildcard) > 0]
+        encoding = min(candidates)[1]
+        return encoding, self.variants[encoding]
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Whether the client's cached copy is still current."""
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return '*' in tags or any(self.etag(encoding) in tags for encoding in self.variants)
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.built
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def headers(self, encoding: str) -> Dict[str, str]:
+        headers = {
+            'ETag': self.etag(encoding),
+            'Last-Modified': self.last_modified,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return headers
+
+def build_page_assets(page: str) -> Dict[str, StaticAsset]:
+    """Split a page with inline <style> and <script> into index.html plus fingerprinted CSS and JS assets."""
+    built = time.time()
+    assets = {}
+    css = '\n'.join(match.strip('\n') for match in _STYLE.findall(page))
+    js = '\n'.join(match.strip('\n') for match in _SCRIPT.findall(page))
+
+    css_asset = StaticAsset('app.css', css.encode(), 'text/css', immutable=True, built=built)
+    css_asset.name = f'app.{css_asset.digest}.css'
+    js_asset = StaticAsset('app.js', js.encode(), 'application/javascript', immutable=True, built=built)
+    js_asset.name = f'app.{js_asset.digest}.js'
+
+    html = _STYLE.sub('', page)
+    html = html.replace('</head>', f'    <link rel="stylesheet" href="{ASSET_PREFIX}{css_asset.name}">\n</head>', 1)
+    html = _SCRIPT.sub('', html)
+    html = html.replace('</body>', f'    <script src="{ASSET_PREFIX}{js_asset.name}"></script>\n</body>', 1)
+    html_asset = StaticAsset('index.html', html.strip().encode(), 'text/html',
+                             immutable=False, built=built)
+
+    for asset in (html_asset, css_asset, js_asset):
+        assets[asset.name] = asset
+    return assets
@@ -0,0 +1,114 @@
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+# The fixed delay both servers used to sleep after every configuration step
+FIXED_STEP_DELAY = 2.0
+# The steps that delay followed; steps added since (e.g. reading the current settings) never had one
+PACED_STEPS = ('Login', 'Media Setup', 'General Setup', 'Save Settings')
+
+def paced_steps(results: Iterable[Dict]) -> int:
+    """How many successful step results the old fixed delay would have followed."""
+    return sum(1 for result in results if result.get('status') == 'success' and result.get('step') in PACED_STEPS)
+
+class SettleTimeTracker:
+    """Learn how long each printer model needs to settle after a configuration step."""
+
+    def __init__(self, default: float = 0.1, alpha: float = 0.3, ceiling: float = FIXED_STEP_DELAY):
+        self.default = default
+        self.alpha = alpha
+        self.ceiling = ceiling
+        self._estimates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, model: str) -> float:
+        """Return the learned settle time for a model, or the default if it has not been seen."""
+        with self._lock:
+            return self._estimates.get(model or 'unknown', self.default)
+
+    def record(self, model: str, observed: float):
+        """Fold an observed settle time into the model's moving average."""
+        observed = min(max(observed, 0.0), self.ceiling)
+        key = model or 'unknown'
+        with self._lock:
+            previous = self._estimates.get(key)
+            if previous is None:
+                self._estimates[key] = observed
+            else:
+                self._estimates[key] = previous + self.alpha * (observed - previous)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return a copy of the learned settle times."""
+        with self._lock:
+            return {model: round(value, 3) for model, value in self._estimates.items()}
+
+# Shared across all printers handled by this process
+SETTLE_TIMES = SettleTimeTracker()
+
+def detect_model(body: str = '', server_header: str = '') -> str:
+    """Extract a printer model name from a web UI page title or Server header."""
+    match = re.search(r'<title>\s*([^<]+?)\s*</title>', body or '', re.IGNORECASE)
+    if match:
+        return match.group(1)[:60]
+    if server_header:
+        return server_header[:60]
+    return 'unknown'
+
+class StepScheduler:
+    """Wait between configuration steps only until the printer's web server answers again."""
+
+    def __init__(self, probe: Callable[[], bool], model: str = 'unknown',
+                 tracker: SettleTimeTracker = SETTLE_TIMES, max_wait: float = FIXED_STEP_DELAY,
+                 initial_backoff: float = 0.05, max_backoff: float = 0.5, deadline=None):
+        self.probe = probe
+        self.deadline = deadline
+        self.model = model
+        self.tracker = tracker
+        self.max_wait = max_wait
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.waits = []
+
+    def wait_ready(self, model: Optional[str] = None) -> float:
+        """Block until the printer is ready for the next step and return the time spent waiting."""
+        if model:
+            self.model = model
+        started = time.monotonic()
+        max_wait = self.max_wait if self.deadline is None else min(self.max_wait, self.deadline.remaining())
+        deadline = started + max_wait
+
+        # Sleep most of the learned settle time up front, then probe with backoff
+        learned = self.tracker.estimate(self.model)
+        time.sleep(min(learned * 0.8, max_wait))
+
+        backoff = self.initial_backoff
+        ready = False
+        while True:
+            try:
+                ready = self.probe()
+            except Exception:
+                ready = False
+            now = time.monotonic()
+            if ready or now >= deadline:
+                break
+            time.sleep(min(backoff, deadline - now))
+            backoff = min(backoff * 2, self.max_backoff)
+
+        waited = time.monotonic() - started
+        if ready:
+            self.tracker.record(self.model, waited)
+        self.waits.append(waited)
+        return waited
+
+    def report(self, steps: Optional[int] = None) -> Dict:
+        """Summarize time spent waiting versus sleeping the fixed delay after each of `steps` steps."""
+        waited = sum(self.waits)
+        fixed = FIXED_STEP_DELAY * (steps if steps is not None else len(self.waits))
+        return {
+            'model': self.model,
+            'waits': len(self.waits),
+            'waited': round(waited, 3),
+            'fixed_delay': round(fixed, 3),
+            'time_saved': round(max(fixed - waited, 0.0), 3)
+        }
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Keep the inventory, login cache and snapshot archive of test runs out of the user's home directory
+STATE_DIR = tempfile.mkdtemp(prefix='zebra-tests-')
+os.environ.setdefault('ZEBRA_INVENTORY', ':memory:')
+os.environ.setdefault('ZEBRA_LOGIN_CACHE', os.path.join(STATE_DIR, 'login_cache.json'))
+os.environ.setdefault('ZEBRA_SNAPSHOTS', os.path.join(STATE_DIR, 'snapshots.jsonl'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import time
+import unittest
+
+from async_printer import AsyncZebraPrinter
+from printer_config import get_profile
+from printer_simulator import SimulatedPrinter, SimulatorSettings
+
+# Every test gets its own loopback address, so breaker and login cache state never carries over
+ADDRESSES = (f'127.0.3.{n}' for n in itertools.count(1))
+
+def wait_for(condition, timeout: float = 2.0):
+    """Poll until `condition()` holds: the simulator handles raw writes after the client has hung up."""
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+class SimulatorTestCase(unittest.TestCase):
+    settings = {}
+
+    def setUp(self):
+        self.simulator = SimulatedPrinter(next(ADDRESSES), 0, 0,
+                                          SimulatorSettings(latency=0, jitter=0, save_delay=0, **self.settings))
+        self.simulator.start()
+        self.addCleanup(self.simulator.stop)
+
+    def printer(self, **options) -> AsyncZebraPrinter:
+        return AsyncZebraPrinter(self.simulator.ip, http_port=self.simulator.http_port,
+                                 raw_port=self.simulator.raw_port, **options)
+
+class RawTransportTest(SimulatorTestCase):
+    def test_apply_configuration_sends_the_profile_zpl_in_one_write(self):
+        profile = get_profile()
+
+        async def apply():
+            async with self.printer(transport='raw') as printer:
+                return await printer.apply_configuration()
+
+        response = asyncio.run(apply())
+        self.assertEqual(response.payload, profile.zpl['all'])
+        self.assertTrue(wait_for(lambda: self.simulator.raw_payloads))
+        self.assertEqual(self.simulator.raw_payloads, [profile.zpl['all']])
+        self.assertEqual(self.simulator.saved, {'media': profile.media, 'general': profile.general})
+
+    def test_raw_steps_send_one_section_each(self):
+        profile = get_profile()
+
+        async def configure():
+            async with self.printer(transport='raw') as printer:
+                await printer.update_media_setup()
+                await printer.update_general_setup()
+                await printer.save_settings()
+
+        asyncio.run(configure())
+        self.assertTrue(wait_for(lambda: len(self.simulator.raw_payloads) == 3))
+        self.assertEqual(sorted(self.simulator.raw_payloads),
+                         sorted([profile.zpl['media'], profile.zpl['general'], profile.zpl['save']]))
+
+class KeepAliveTest(SimulatorTestCase):
+    settings = {'idle_timeout': 0.2}
+
+    def connections(self) -> int:
+        # Counted after the login, as the breaker's reachability pre-check opens a connection of its own
+        return self.simulator.counters['connections']
+
+    def test_requests_reuse_one_connection(self):
+        async def read():
+            async with self.printer() as printer:
+                await printer.login()
+                opened = self.connections()
+                return opened, await printer.read_current_settings()
+
+        opened, current = asyncio.run(read())
+        self.assertEqual(current['media'], self.simulator.media)
+        self.assertEqual(self.connections(), opened)
+
+    def test_reconnects_after_the_printer_closes_an_idle_connection(self):
+        async def read_twice():
+            async with self.printer() as printer:
+                await printer.login()
+                opened = self.connections()
+                first = await printer.read_current_settings()
+                await asyncio.sleep(0.4)
+                return opened, first, await printer.read_current_settings()
+
+        opened, first, second = asyncio.run(read_twice())
+        self.assertEqual(first, second)
+        self.assertEqual(self.connections(), opened + 1)
+        # The session cookie survives the reconnect, so no second login is needed
+        self.assertEqual(self.simulator.counters['logins'], 1)
+
+class ChunkedResponseTest(KeepAliveTest):
+    """The keep-alive tests again, with every page sent in chunks."""
+    settings = {'idle_timeout': 0.2, 'chunked': True}
+
+    def test_login_response_is_chunked(self):
+        async def login():
+            async with self.printer() as printer:
+                return await printer.login()
+
+        response = asyncio.run(login())
+        self.assertEqual(response.headers['Transfer-Encoding'], 'chunked')
+        self.assertIn('Settings', response.text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import time
+import unittest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, PrinterUnreachable
+
+HOST = '192.0.2.10'
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        # An infinite pre-check TTL keeps these tests off the network
+        self.breaker = CircuitBreaker(threshold=2, reset_timeout=0.05, precheck_ttl=float('inf'))
+
+    def state(self):
+        return self.breaker.state(HOST)['state']
+
+    def open_circuit(self):
+        for _ in range(2):
+            with self.breaker.admission(HOST, 80):
+                self.breaker.record_failure(HOST, 'connection refused')
+
+    def test_opens_after_threshold_failures(self):
+        with self.breaker.admission(HOST, 80):
+            self.breaker.record_failure(HOST, 'connection refused')
+        self.assertEqual(self.state(), CLOSED)
+        with self.breaker.admission(HOST, 80):
+            self.breaker.record_failure(HOST, 'connection refused')
+        self.assertEqual(self.state(), OPEN)
+        with self.assertRaises(PrinterUnreachable):
+            with self.breaker.admission(HOST, 80):
+                pass
+
+    def test_half_open_trial_success_closes(self):
+        self.open_circuit()
+        time.sleep(0.06)
+        with self.breaker.admission(HOST, 80):
+            self.assertEqual(self.state(), HALF_OPEN)
+            with self.assertRaises(PrinterUnreachable):
+                with self.breaker.admission(HOST, 80):
+                    pass
+            self.breaker.record_success(HOST)
+        self.assertEqual(self.state(), CLOSED)
+        with self.breaker.admission(HOST, 80):
+            pass
+
+    def test_half_open_trial_failure_reopens(self):
+        self.open_circuit()
+        time.sleep(0.06)
+        with self.breaker.admission(HOST, 80):
+            self.breaker.record_failure(HOST, 'timed out')
+        self.assertEqual(self.state(), OPEN)
+        with self.assertRaises(PrinterUnreachable):
+            with self.breaker.admission(HOST, 80):
+                pass
+
+    def test_trial_released_when_request_raises(self):
+        self.open_circuit()
+        time.sleep(0.06)
+        with self.assertRaises(ValueError):
+            with self.breaker.admission(HOST, 80):
+                raise ValueError('unparseable response')
+        self.assertEqual(self.state(), HALF_OPEN)
+        # The next request becomes the trial instead of being turned away
+        with self.breaker.admission(HOST, 80):
+            self.breaker.record_success(HOST)
+        self.assertEqual(self.state(), CLOSED)
+
+    def test_stale_trial_does_not_release_a_newer_one(self):
+        self.open_circuit()
+        time.sleep(0.06)
+        first = self.breaker.admission(HOST, 80)
+        first.__enter__()
+        self.breaker.record_failure(HOST, 'timed out')
+        time.sleep(0.06)
+        second = self.breaker.admission(HOST, 80)
+        second.__enter__()
+        first.__exit__(None, None, None)
+        with self.assertRaises(PrinterUnreachable):
+            with self.breaker.admission(HOST, 80):
+                pass
+        second.__exit__(None, None, None)
+
+    def test_async_trial_released_on_cancellation(self):
+        self.open_circuit()
+        time.sleep(0.06)
+
+        async def request():
+            async with self.breaker.admission_async(HOST, 80):
+                await asyncio.sleep(10)
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(request())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        with self.breaker.admission(HOST, 80):
+            self.breaker.record_success(HOST)
+        self.assertEqual(self.state(), CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import time
+import unittest
+from unittest import mock
+from urllib.parse import urlencode
+
+from local_proxy import PrinterClientPool, parse_batch_request
+from printer_config import get_profile
+from printer_simulator import SimulatedPrinter, SimulatorSettings
+
+FORM = 'application/x-www-form-urlencoded'
+
+class ParseBatchRequestTest(unittest.TestCase):
+    def test_profile_name_in_json_body(self):
+        body = json.dumps({'printer_ips': ['192.0.2.1'], 'profile': 'default'})
+        ips, options = parse_batch_request(body, 'application/json')
+        self.assertEqual(ips, ['192.0.2.1'])
+        self.assertEqual(options['profile'].hash, get_profile('default').hash)
+
+    def test_profile_name_in_form_body(self):
+        body = urlencode({'printer_ips': '192.0.2.1,192.0.2.2', 'profile': 'default'})
+        ips, options = parse_batch_request(body, FORM)
+        self.assertEqual(ips, ['192.0.2.1', '192.0.2.2'])
+        self.assertEqual(options['profile'].hash, get_profile('default').hash)
+
+    def test_inline_profile_in_form_body(self):
+        profile = {'media': {'1': '1'}, 'general': {'1': '1', '12': '0'}}
+        body = urlencode({'printer_ips': '192.0.2.1', 'profile': json.dumps(profile)})
+        _, options = parse_batch_request(body, FORM)
+        self.assertEqual(options['profile'].name, 'custom')
+        self.assertEqual(options['profile'].media, {'1': '1'})
+
+    def test_unknown_profile_name_is_rejected(self):
+        for body, content_type in ((json.dumps({'printer_ips': ['192.0.2.1'], 'profile': 'nope'}), 'application/json'),
+                                   (urlencode({'printer_ips': '192.0.2.1', 'profile': 'nope'}), FORM)):
+            with self.assertRaises(ValueError):
+                parse_batch_request(body, content_type)
+
+class PrinterClientPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.simulator = SimulatedPrinter('127.0.6.1', 0, 0, SimulatorSettings(latency=0, jitter=0)).start()
+        self.addCleanup(self.simulator.stop)
+        patcher = mock.patch('local_proxy.PRINTER_HTTP_PORT', self.simulator.http_port)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = PrinterClientPool(idle_timeout=0.2)
+
+    def test_idle_client_is_closed_without_further_requests(self):
+        client = self.pool.get(self.simulator.ip)
+        client.request('HEAD', '/', guarded=False)
+        self.assertIsNotNone(client._connection)
+        time.sleep(0.4)
+        self.assertIsNone(client._connection)
+        self.assertNotIn(self.simulator.ip, self.pool._clients)
+
+    def test_busy_client_is_kept(self):
+        client = self.pool.get(self.simulator.ip)
+        client.request('HEAD', '/', guarded=False)
+        client.last_used -= 1
+        with client._lock:
+            self.assertEqual(self.pool.evict_idle(), 0)
+            self.assertIs(self.pool.get(self.simulator.ip), client)
+        self.assertIsNotNone(client._connection)
+
+if __name__ == '__main__':
+    unittest.main()
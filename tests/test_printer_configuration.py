@@ -0,0 +1,51 @@
+import itertools
+import unittest
+
+from printer_config import get_profile
+from printer_simulator import SimulatedPrinter, SimulatorSettings
+from TESTINGRENDER import ZebraPrinter, run_printer_configuration
+
+ADDRESSES = (f'127.0.4.{n}' for n in itertools.count(1))
+
+class FormDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.profile = get_profile()
+
+    def configure(self, media, general):
+        """Configure a simulated printer that starts with the given settings."""
+        settings = SimulatorSettings(latency=0, jitter=0, save_delay=0, media=media, general=general)
+        self.simulator = SimulatedPrinter(next(ADDRESSES), 0, 0, settings).start()
+        self.addCleanup(self.simulator.stop)
+        with ZebraPrinter(self.simulator.ip, http_port=self.simulator.http_port, profile=self.profile) as printer:
+            return run_printer_configuration(printer)
+
+    def statuses(self, outcome):
+        return {step['step']: step['status'] for step in outcome['steps']}
+
+    def test_printer_already_configured_gets_no_forms(self):
+        outcome = self.configure(dict(self.profile.media), dict(self.profile.general))
+        self.assertTrue(outcome['success'])
+        self.assertEqual(outcome['changes'], {'media': {}, 'general': {}})
+        self.assertEqual(self.simulator.forms, [])
+        self.assertEqual(self.simulator.counters['saves'], 0)
+        self.assertEqual(self.statuses(outcome)['Save Settings'], 'skipped')
+
+    def test_only_differing_fields_are_posted(self):
+        general = dict(self.profile.general, **{'1': '1'})
+        outcome = self.configure(dict(self.profile.media), general)
+        self.assertTrue(outcome['success'])
+        self.assertEqual(outcome['changes'], {'media': {}, 'general': {'1': self.profile.general['1']}})
+        self.assertEqual(self.simulator.forms, [('/setgen', {'1': self.profile.general['1']})])
+        self.assertEqual(self.statuses(outcome)['Media Setup'], 'skipped')
+        self.assertEqual(self.simulator.counters['saves'], 1)
+        self.assertEqual(self.simulator.saved, {'media': self.profile.media, 'general': self.profile.general})
+
+    def test_every_section_is_posted_when_everything_differs(self):
+        outcome = self.configure({'1': '1', '15': '1', '16': '2'}, {'1': '1', '12': '800'})
+        self.assertTrue(outcome['success'])
+        self.assertEqual([path for path, _ in self.simulator.forms], ['/setmed', '/setgen'])
+        self.assertEqual(self.simulator.forms[0][1], self.profile.media)
+        self.assertEqual(self.simulator.forms[1][1], self.profile.general)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import itertools
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from printer_locks import CONFIGURATIONS_COALESCED, PrinterBusy, PrinterLocks, configuration_key
+from printer_simulator import SimulatedPrinter, SimulatorSettings
+from TESTINGRENDER import ZebraPrinter, run_printer_configuration
+
+ADDRESSES = (f'127.0.5.{n}' for n in itertools.count(1))
+CALLERS = 4
+
+def coalesced() -> float:
+    return CONFIGURATIONS_COALESCED._values.get((), 0)
+
+class PrinterLocksTest(unittest.TestCase):
+    def setUp(self):
+        self.locks = PrinterLocks(wait=0.1)
+        self.release = threading.Event()
+
+    def test_identical_requests_share_one_configuration(self):
+        # Enough latency that every caller arrives while the first run is still going
+        simulator = SimulatedPrinter(next(ADDRESSES), 0, 0, SimulatorSettings(latency=0.05, jitter=0)).start()
+        self.addCleanup(simulator.stop)
+        key = configuration_key('default', 'web')
+        arrived = threading.Barrier(CALLERS)
+
+        def configure():
+            with ZebraPrinter(simulator.ip, http_port=simulator.http_port) as printer:
+                arrived.wait()
+                return self.locks.run(simulator.ip, key, lambda: run_printer_configuration(printer))
+
+        before = coalesced()
+        with ThreadPoolExecutor(CALLERS) as pool:
+            outcomes = list(pool.map(lambda _: configure(), range(CALLERS)))
+
+        self.assertTrue(all(outcome['success'] for outcome in outcomes))
+        self.assertTrue(all(outcome == outcomes[0] for outcome in outcomes))
+        self.assertEqual(coalesced() - before, CALLERS - 1)
+        self.assertEqual(simulator.counters['GET /setmed'], 1)
+        self.assertEqual(simulator.counters['saves'], 1)
+
+    def follow(self, pool, ip):
+        """Submit an identical request once the leader's run is in flight, giving it time to join."""
+        while not self.locks._flights:
+            time.sleep(0.001)
+        follower = pool.submit(self.locks.run, ip, 'key', lambda: self.fail('ran twice'))
+        time.sleep(0.05)
+        self.release.set()
+        return follower
+
+    def test_followers_get_their_own_copy(self):
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(self.locks.run, '192.0.2.1', 'key',
+                                 lambda: self.release.wait() and {'steps': []})
+            follower = self.follow(pool, '192.0.2.1')
+            first, second = leader.result(), follower.result()
+        second['steps'].append('changed')
+        self.assertEqual(first, {'steps': []})
+
+    def test_failure_is_shared_with_identical_requests(self):
+        def fail():
+            self.release.wait()
+            raise RuntimeError('printer said no')
+
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(self.locks.run, '192.0.2.2', 'key', fail)
+            follower = self.follow(pool, '192.0.2.2')
+            for future in (leader, follower):
+                with self.assertRaisesRegex(RuntimeError, 'printer said no'):
+                    future.result()
+
+    def test_different_request_waits_then_gives_up(self):
+        with ThreadPoolExecutor(1) as pool:
+            leader = pool.submit(self.locks.run, '192.0.2.3', 'key', self.release.wait, None, 'a fleet run')
+            while not self.locks._holders:
+                time.sleep(0.001)
+            with self.assertRaisesRegex(PrinterBusy, 'a fleet run'):
+                self.locks.run('192.0.2.3', 'other key', lambda: self.fail('ran while busy'))
+            self.release.set()
+            self.assertTrue(leader.result())
+
+if __name__ == '__main__':
+    unittest.main()